@@ -1,7 +1,11 @@
 #region generated meta
 import typing
 class Inputs(typing.TypedDict):
-    data: list[dict]
+    data: list[dict] | None
+    file_path: str | None
+    chunk_rows: int | None
+    states: list[dict] | None
+    partial: bool | None
     mode: typing.Literal["groupBy", "pivot"]
     group_by: list[str] | None
     aggregations: list[dict] | None
@@ -12,16 +16,61 @@ class Outputs(typing.TypedDict):
     shape: typing.NotRequired[dict]
     group_count: typing.NotRequired[int]
     pivot_columns: typing.NotRequired[list[str]]
+    state: typing.NotRequired[dict]
 #endregion
 
 from oocana import Context
+from itertools import chain
 import pandas as pd
+import numpy as np
+import base64
+import chardet
+import os
+
+
+# Aggregation names mapped to pandas' built-in (Cython) groupby reductions; "list" is handled separately
+GROUPBY_FUNCTIONS = {
+    "sum": "sum",
+    "avg": "mean",
+    "count": "count",
+    "min": "min",
+    "max": "max",
+    "median": "median",
+    "std": "std",
+    "var": "var",
+    "countUnique": "nunique",
+    "first": "first",
+    "last": "last"
+}
+
+STREAM_CHUNK_ROWS = 100000
+# Per-group collections (distinct values, median values) stay exact up to this size, then become sketches
+SKETCH_CAPACITY = 1024
+# HyperLogLog registers = 2 ** precision (about 1.6% relative error at 12)
+HLL_PRECISION = 12
+STATE_VERSION = 1
 
 
 async def main(params: Inputs, context: Context) -> Outputs:
-    """Aggregate table data using GROUP BY or pivot operations."""
+    """
+    Aggregate table data using GROUP BY or pivot operations.
+
+    GroupBy mode also takes chunked input: earlier partial states, data and a file read
+    in chunks are folded, in that order, into mergeable per-group states. With partial
+    enabled those states are returned for later calls or other workers to merge;
+    otherwise they are finalized into the usual result.
+    """
+
+    data = params.get("data") or []
+    file_path = params.get("file_path")
+    states = params.get("states") or []
+    partial = params.get("partial") or False
+
+    if file_path or states or partial:
+        if params["mode"] != "groupBy":
+            raise ValueError("Chunked input and partial states are only supported in groupBy mode")
+        return incremental_group_by(params, data, file_path, states, partial)
 
-    data = params["data"]
     if not data:
         return {
             "data": [],
@@ -52,63 +101,32 @@ async def main(params: Inputs, context: Context) -> Outputs:
             if col not in df.columns:
                 raise ValueError(f"Group by column '{col}' not found in data")
 
-        # Build aggregation dictionary
-        agg_dict: dict[str, typing.Any] = {}
-        for agg in aggregations:
-            col = agg["column"]
-            func = agg["function"]
-            alias = agg.get("alias") or f"{col}_{func}"
-
+        specs = normalize_aggregations(aggregations)
+        for col, _, _ in specs:
             if col not in df.columns:
                 raise ValueError(f"Aggregation column '{col}' not found in data")
+        aliases = [alias for _, alias, _ in specs]
 
-            # Map function name to pandas function
-            if func == "sum":
-                agg_func = "sum"
-            elif func == "avg":
-                agg_func = "mean"
-            elif func == "count":
-                agg_func = "count"
-            elif func == "min":
-                agg_func = "min"
-            elif func == "max":
-                agg_func = "max"
-            elif func == "median":
-                agg_func = "median"
-            elif func == "std":
-                agg_func = "std"
-            elif func == "var":
-                agg_func = "var"
-            elif func == "countUnique":
-                agg_func = "nunique"
-            elif func == "first":
-                agg_func = "first"
-            elif func == "last":
-                agg_func = "last"
-            elif func == "list":
-                agg_func = lambda x: x.tolist()
-            else:
-                raise ValueError(f"Unsupported aggregation function: {func}")
-
-            # Add to aggregation dict
-            if col not in agg_dict:
-                agg_dict[col] = []
-            agg_dict[col].append((alias, agg_func))
-
-        # Perform group by
+        # Perform group by; the group index is factorized once and shared by every aggregation
         grouped = df.groupby(group_by)
 
-        # Apply aggregations
-        agg_results = []
-        for col, funcs in agg_dict.items():
-            for alias, func in funcs:
-                agg_results.append(grouped[col].agg(**{alias: func}))
-
-        # Combine results
-        if agg_results:
-            result_df = pd.concat(agg_results, axis=1).reset_index()
+        # All built-in reductions in one named-aggregation call
+        named_aggs = {
+            alias: pd.NamedAgg(column=col, aggfunc=GROUPBY_FUNCTIONS[func])
+            for col, alias, func in specs if func != "list"
+        }
+        if named_aggs:
+            result_df = grouped.agg(**named_aggs)
         else:
-            result_df = grouped.size().reset_index(name='count')
+            result_df = pd.DataFrame(index=grouped.size().index)
+
+        list_aggs = [(alias, col) for col, alias, func in specs if func == "list"]
+        if list_aggs:
+            group_codes = grouped.ngroup().to_numpy()
+            for alias, col in list_aggs:
+                result_df[alias] = group_lists(df[col], group_codes, len(result_df))
+
+        result_df = result_df[aliases].reset_index()
 
         group_count = len(result_df)
 
@@ -189,3 +207,361 @@ async def main(params: Inputs, context: Context) -> Outputs:
         raise ValueError(f"Unsupported aggregation mode: {mode}")
 
     return output
+
+
+def normalize_aggregations(aggregations: list[dict]) -> list[tuple[str, str, str]]:
+    """(column, alias, function) per aggregation, grouped by column in first-seen order."""
+    agg_dict: dict[str, list[tuple[str, str]]] = {}
+    for agg in aggregations:
+        col = agg["column"]
+        func = agg["function"]
+        alias = agg.get("alias") or f"{col}_{func}"
+        if func not in GROUPBY_FUNCTIONS and func != "list":
+            raise ValueError(f"Unsupported aggregation function: {func}")
+        agg_dict.setdefault(col, []).append((alias, func))
+
+    # Output columns keep the per-column order: all aggregations of a column together
+    specs = [(col, alias, func) for col, funcs in agg_dict.items() for alias, func in funcs]
+    aliases = [alias for _, alias, _ in specs]
+    if len(set(aliases)) != len(aliases):
+        raise ValueError(f"Duplicate aggregation aliases: {sorted({a for a in aliases if aliases.count(a) > 1})}")
+    return specs
+
+
+def group_lists(values: pd.Series, group_codes: np.ndarray, group_count: int) -> list[list]:
+    """Each group's values as a list, from one stable sort by group code instead of a call per group."""
+    # Rows whose group key is null belong to no group (NaN code)
+    rows = np.flatnonzero(~pd.isna(group_codes))
+    codes = group_codes[rows].astype(np.int64)
+    order = np.argsort(codes, kind="stable")
+    flat = values.iloc[rows[order]].tolist()
+    ends = np.cumsum(np.bincount(codes, minlength=group_count))
+    return [flat[start:end] for start, end in zip(np.concatenate([[0], ends[:-1]]), ends)]
+
+
+def incremental_group_by(params: Inputs, data: list[dict], file_path: str | None, states: list[dict], partial: bool) -> Outputs:
+    """Fold partial states, data and file chunks into per-group states, then finalize or return them."""
+    group_by = params.get("group_by")
+    aggregations = params.get("aggregations")
+    if not group_by:
+        raise ValueError("'group_by' parameter required for groupBy mode")
+    if not aggregations:
+        raise ValueError("'aggregations' parameter required for groupBy mode")
+    specs = normalize_aggregations(aggregations)
+    if file_path and not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    running: pd.DataFrame | None = None
+    rows = 0
+
+    def fold(incoming: pd.DataFrame, incoming_rows: int) -> None:
+        nonlocal running, rows
+        # Order keys of first/last continue after every row folded so far
+        for _, alias, func in specs:
+            if func in ["first", "last"]:
+                incoming[(alias, "order")] = pd.to_numeric(incoming[(alias, "order")]) + rows
+        running = incoming if running is None else merge_states([running, incoming], group_by, specs)
+        rows += incoming_rows
+
+    for state in states:
+        fold(state_frame(state, group_by, specs), state["rows"])
+
+    chunks = [pd.DataFrame(data)] if data else []
+    for chunk in chain(chunks, _read_chunks(file_path, params) if file_path else []):
+        for col in group_by:
+            if col not in chunk.columns:
+                raise ValueError(f"Group by column '{col}' not found in data")
+        for col, _, _ in specs:
+            if col not in chunk.columns:
+                raise ValueError(f"Aggregation column '{col}' not found in data")
+        fold(chunk_state(chunk, group_by, specs), len(chunk))
+
+    if running is None:
+        running = chunk_state(pd.DataFrame(columns=list(dict.fromkeys(group_by + [col for col, _, _ in specs]))), group_by, specs)
+
+    if partial:
+        return {
+            "state": state_dict(running, rows, group_by, specs),
+            "mode": "groupBy",
+            "group_count": len(running)
+        }
+
+    result_df = finalize_states(running, specs).reset_index()
+    return {
+        "data": result_df.to_dict('records'),
+        "mode": "groupBy",
+        "shape": {"rows": len(result_df), "cols": len(result_df.columns)},
+        "group_count": len(result_df)
+    }
+
+
+def chunk_state(df: pd.DataFrame, group_by: list[str], specs: list[tuple[str, str, str]]) -> pd.DataFrame:
+    """Per-group partial states of one chunk: group keys as the index, (alias, component) columns."""
+    grouped = df.groupby(group_by)
+    index = grouped.size().index
+    group_codes = grouped.ngroup().to_numpy()
+    positions = pd.Series(np.arange(len(df), dtype=np.float64), index=df.index)
+    components: dict[tuple[str, str], typing.Any] = {}
+
+    for col, alias, func in specs:
+        values = df[col]
+        if func in ["count", "avg", "std", "var"]:
+            components[(alias, "n")] = grouped[col].count()
+        if func in ["sum", "avg"]:
+            components[(alias, "sum")] = grouped[col].sum()
+        if func in ["std", "var"]:
+            # Mean and sum of squared deviations merge exactly (Chan et al.), unlike raw sums of squares
+            components[(alias, "mean")] = grouped[col].mean()
+            components[(alias, "m2")] = (grouped[col].var(ddof=0) * components[(alias, "n")]).fillna(0.0)
+        if func in ["min", "max", "first", "last"]:
+            components[(alias, "value")] = grouped[col].agg(func)
+        if func in ["first", "last"]:
+            # Row position of the first/last non-null value, so merged states keep row order
+            components[(alias, "order")] = positions.where(values.notna()).groupby(group_codes).agg(func).reindex(range(len(index))).to_numpy()
+        if func == "list":
+            components[(alias, "values")] = group_lists(values, group_codes, len(index))
+        if func in ["countUnique", "median"]:
+            present = values.notna().to_numpy()
+            pairs = pd.DataFrame({"code": group_codes[present], "value": values[present].to_numpy()})
+            if func == "countUnique":
+                pairs = pairs.drop_duplicates()
+            collected = group_lists(pairs["value"], pairs["code"].to_numpy(), len(index))
+            merge = _merge_distinct if func == "countUnique" else _merge_quantiles
+            components[(alias, "sketch")] = [merge([group_values]) for group_values in collected]
+
+    frame = pd.DataFrame({key: _aligned(value, index) for key, value in components.items()}, index=index)
+    frame.columns = pd.MultiIndex.from_tuples(frame.columns)
+    return frame
+
+
+def merge_states(frames: list[pd.DataFrame], group_by: list[str], specs: list[tuple[str, str, str]]) -> pd.DataFrame:
+    """Combine per-group states of several chunks (in row order) into one state per group."""
+    frames = [frame for frame in frames if len(frame)] or frames[:1]
+    if len(frames) == 1:
+        return frames[0]
+    both = pd.concat(frames)
+    grouped = both.groupby(level=list(range(both.index.nlevels)))
+    index = grouped.size().index
+    group_codes = grouped.ngroup().to_numpy()
+    components: dict[tuple[str, str], typing.Any] = {}
+
+    def reduce(key: tuple[str, str], func: str, rows: np.ndarray | None = None) -> np.ndarray:
+        """One reduction of a state component per group code (every code has at least one row)."""
+        values = both[key] if rows is None else both[key].iloc[rows]
+        return values.groupby(group_codes if rows is None else group_codes[rows]).agg(func).to_numpy()
+
+    for _, alias, func in specs:
+        if func in ["count", "avg", "std", "var"]:
+            components[(alias, "n")] = reduce((alias, "n"), "sum")
+        if func in ["sum", "avg"]:
+            components[(alias, "sum")] = reduce((alias, "sum"), "sum")
+        if func in ["std", "var"]:
+            n = both[(alias, "n")].to_numpy(dtype=np.float64)
+            mean = both[(alias, "mean")].to_numpy(dtype=np.float64)
+            total = np.bincount(group_codes, weights=n, minlength=len(index))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                merged_mean = np.bincount(group_codes, weights=np.where(n > 0, n * mean, 0.0), minlength=len(index)) / total
+                spread = np.where(n > 0, both[(alias, "m2")].to_numpy(dtype=np.float64) + n * (mean - merged_mean[group_codes]) ** 2, 0.0)
+            components[(alias, "mean")] = merged_mean
+            components[(alias, "m2")] = np.bincount(group_codes, weights=spread, minlength=len(index))
+        if func in ["min", "max"]:
+            components[(alias, "value")] = reduce((alias, "value"), func)
+        if func in ["first", "last"]:
+            # Null orders (no value in that chunk) sort last and are skipped by first/last
+            rows = np.argsort(pd.to_numeric(both[(alias, "order")]).to_numpy(), kind="stable")
+            components[(alias, "value")] = reduce((alias, "value"), func, rows)
+            components[(alias, "order")] = reduce((alias, "order"), func, rows)
+        if func == "list":
+            components[(alias, "values")] = _concat_lists(both[(alias, "values")], group_codes, len(index))
+        if func in ["countUnique", "median"]:
+            merge = _merge_distinct if func == "countUnique" else _merge_quantiles
+            sketches = _concat_lists(both[(alias, "sketch")].map(lambda sketch: [sketch]), group_codes, len(index))
+            components[(alias, "sketch")] = [merge(group_sketches) for group_sketches in sketches]
+
+    frame = pd.DataFrame({key: _aligned(value, index) for key, value in components.items()}, index=index)
+    frame.columns = pd.MultiIndex.from_tuples(frame.columns)
+    return frame
+
+
+def finalize_states(frame: pd.DataFrame, specs: list[tuple[str, str, str]]) -> pd.DataFrame:
+    """Final aggregation values from per-group states, in the same layout as a one-shot groupBy."""
+    result: dict[str, typing.Any] = {}
+    for _, alias, func in specs:
+        if func == "count":
+            result[alias] = frame[(alias, "n")].astype(np.int64)
+        elif func == "sum":
+            result[alias] = frame[(alias, "sum")]
+        elif func == "avg":
+            result[alias] = frame[(alias, "sum")] / frame[(alias, "n")].where(frame[(alias, "n")] > 0)
+        elif func in ["std", "var"]:
+            n = frame[(alias, "n")]
+            variance = frame[(alias, "m2")] / (n - 1).where(n > 1)
+            result[alias] = np.sqrt(variance) if func == "std" else variance
+        elif func in ["min", "max", "first", "last"]:
+            result[alias] = frame[(alias, "value")]
+        elif func == "list":
+            result[alias] = frame[(alias, "values")]
+        elif func == "countUnique":
+            result[alias] = [_distinct_count(sketch) for sketch in frame[(alias, "sketch")]]
+        elif func == "median":
+            result[alias] = [_quantile_median(sketch) for sketch in frame[(alias, "sketch")]]
+    return pd.DataFrame(result, index=frame.index)
+
+
+def state_dict(frame: pd.DataFrame, rows: int, group_by: list[str], specs: list[tuple[str, str, str]]) -> dict:
+    """JSON-friendly partial state: group keys and state components as column lists."""
+    keys = frame.index.to_frame(index=False)
+    states: dict[str, dict[str, list]] = {}
+    for alias, component in frame.columns:
+        states.setdefault(alias, {})[component] = frame[(alias, component)].tolist()
+    return {
+        "version": STATE_VERSION,
+        "group_by": group_by,
+        "aggregations": [{"column": col, "alias": alias, "function": func} for col, alias, func in specs],
+        "rows": rows,
+        "keys": {col: keys[col].tolist() for col in group_by},
+        "states": states
+    }
+
+
+def state_frame(state: dict, group_by: list[str], specs: list[tuple[str, str, str]]) -> pd.DataFrame:
+    """Rebuild the per-group state frame from a partial state produced by state_dict."""
+    if state.get("version") != STATE_VERSION:
+        raise ValueError(f"Unsupported partial state version: {state.get('version')}")
+    if state.get("group_by") != group_by:
+        raise ValueError(f"Partial state groups by {state.get('group_by')}, expected {group_by}")
+    state_specs = [(agg["column"], agg["alias"], agg["function"]) for agg in state.get("aggregations", [])]
+    if state_specs != specs:
+        raise ValueError("Partial state aggregations differ from the requested aggregations")
+
+    keys = pd.DataFrame({col: state["keys"][col] for col in group_by})
+    index = pd.MultiIndex.from_frame(keys) if len(group_by) > 1 else pd.Index(keys[group_by[0]], name=group_by[0])
+    frame = pd.DataFrame(
+        {(alias, component): values for alias, components in state["states"].items() for component, values in components.items()},
+        index=index
+    )
+    frame.columns = pd.MultiIndex.from_tuples(frame.columns)
+    return frame
+
+
+def _aligned(value: typing.Any, index: pd.Index) -> typing.Any:
+    """Component values as a plain sequence in group order."""
+    if isinstance(value, pd.Series):
+        return value.reindex(index).to_numpy()
+    return value
+
+
+def _concat_lists(lists: pd.Series, group_codes: np.ndarray, group_count: int) -> list[list]:
+    """Concatenate the lists of every group's rows, in row order."""
+    lengths = lists.map(len).to_numpy()
+    flat = pd.Series(list(chain.from_iterable(lists)), dtype=object)
+    return group_lists(flat, np.repeat(group_codes, lengths), group_count)
+
+
+def _merge_distinct(parts: list) -> typing.Any:
+    """Union of distinct-value states: exact value lists, or a HyperLogLog sketch once too many values."""
+    sketches = [part for part in parts if isinstance(part, dict)]
+    values = list(dict.fromkeys(chain.from_iterable(part for part in parts if not isinstance(part, dict))))
+    if not sketches and len(values) <= SKETCH_CAPACITY:
+        return values
+
+    registers = np.zeros(1 << HLL_PRECISION, dtype=np.uint8)
+    for sketch in sketches:
+        registers = np.maximum(registers, np.frombuffer(base64.b64decode(sketch["hll"]), dtype=np.uint8))
+    if values:
+        hashes = _value_hashes(values)
+        buckets = (hashes >> np.uint64(64 - HLL_PRECISION)).astype(np.int64)
+        # Rank = leading zeros of the remaining bits + 1 (a sentinel bit caps it)
+        rest = (hashes << np.uint64(HLL_PRECISION)) | np.uint64(1 << (HLL_PRECISION - 1))
+        ranks = np.ones(len(rest), dtype=np.uint8)
+        for shift in [32, 16, 8, 4, 2, 1]:
+            empty = (rest >> np.uint64(64 - shift)) == 0
+            ranks[empty] += shift
+            rest = np.where(empty, rest << np.uint64(shift), rest)
+        np.maximum.at(registers, buckets, ranks)
+    return {"hll": base64.b64encode(registers.tobytes()).decode("ascii")}
+
+
+def _distinct_count(sketch: typing.Any) -> int:
+    if not isinstance(sketch, dict):
+        return len(sketch)
+    registers = np.frombuffer(base64.b64decode(sketch["hll"]), dtype=np.uint8).astype(np.float64)
+    m = len(registers)
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(2.0 ** -registers)
+    zeros = int((registers == 0).sum())
+    if estimate <= 2.5 * m and zeros:
+        # Linear counting is more accurate for small cardinalities
+        estimate = m * np.log(m / zeros)
+    return int(round(estimate))
+
+
+def _value_hashes(values: list) -> np.ndarray:
+    """Stable 64-bit hashes; numbers hash as float64 so 1 and 1.0 count once, like nunique."""
+    array = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(array) and not pd.api.types.is_bool_dtype(array):
+        return pd.util.hash_array(array.to_numpy(dtype=np.float64) + 0.0)
+    return pd.util.hash_array(array.astype(str).to_numpy(dtype=object))
+
+
+def _merge_quantiles(parts: list) -> typing.Any:
+    """Union of median states: exact value lists, or a weighted quantile summary once too many values."""
+    summaries = [part for part in parts if isinstance(part, dict)]
+    values = list(chain.from_iterable(part for part in parts if not isinstance(part, dict)))
+    if not summaries and len(values) <= SKETCH_CAPACITY:
+        return values
+
+    points = np.concatenate([np.asarray(values, dtype=np.float64)] + [np.asarray(s["values"], dtype=np.float64) for s in summaries])
+    weights = np.concatenate([np.ones(len(values))] + [np.asarray(s["weights"], dtype=np.float64) for s in summaries])
+    if len(points) > SKETCH_CAPACITY:
+        # Keep SKETCH_CAPACITY evenly spaced quantiles, each standing for an equal share of the weight
+        order = np.argsort(points, kind="stable")
+        points, cumulative = points[order], np.cumsum(weights[order])
+        targets = (np.arange(SKETCH_CAPACITY) + 0.5) * cumulative[-1] / SKETCH_CAPACITY
+        points = points[np.searchsorted(cumulative, targets)]
+        weights = np.full(SKETCH_CAPACITY, cumulative[-1] / SKETCH_CAPACITY)
+    return {"values": points.tolist(), "weights": weights.tolist()}
+
+
+def _quantile_median(sketch: typing.Any) -> float:
+    if not isinstance(sketch, dict):
+        return float(np.median(sketch)) if len(sketch) else np.nan
+    points = np.asarray(sketch["values"], dtype=np.float64)
+    weights = np.asarray(sketch["weights"], dtype=np.float64)
+    order = np.argsort(points, kind="stable")
+    cumulative = np.cumsum(weights[order])
+    return float(points[order][np.searchsorted(cumulative, cumulative[-1] / 2)])
+
+
+def _read_chunks(file_path: str, params: Inputs):
+    """Yield the file as DataFrames of at most chunk_rows rows."""
+    chunk_rows = params.get("chunk_rows") or STREAM_CHUNK_ROWS
+    ext = os.path.splitext(file_path)[1].lower()
+
+    if ext in [".xlsx", ".xls"]:
+        import openpyxl
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+            batch = []
+            for row in rows:
+                batch.append(row[:len(columns)])
+                if len(batch) == chunk_rows:
+                    yield pd.DataFrame(batch, columns=columns)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=columns)
+        finally:
+            wb.close()
+
+    elif ext in [".csv", ".tsv"]:
+        with open(file_path, 'rb') as f:
+            encoding = chardet.detect(f.read(10000))['encoding'] or 'utf-8'
+        delimiter = '\t' if ext == ".tsv" else ','
+        yield from pd.read_csv(file_path, encoding=encoding, sep=delimiter, chunksize=chunk_rows)
+
+    else:
+        raise ValueError(f"Cannot auto-detect format for extension: {ext}")
@@ -7,15 +7,62 @@ class Inputs(typing.TypedDict):
     limit: int | None
     offset: int | None
     sort_by: list[dict] | None
+    index_options: dict | None
+    cursor: str | None
 class Outputs(typing.TypedDict):
     data: typing.NotRequired[list[dict]]
     filtered_count: typing.NotRequired[int]
     total_count: typing.NotRequired[int]
     columns: typing.NotRequired[list[str]]
+    index_stats: typing.NotRequired[dict]
+    next_cursor: typing.NotRequired[str | None]
 #endregion
 
 from oocana import Context
 import pandas as pd
+import numpy as np
+from collections import OrderedDict
+import base64
+import binascii
+import hashlib
+import json
+import pickle
+import re
+import time
+
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+    pc = None
+
+# Rows used to estimate how selective each condition is
+SELECTIVITY_SAMPLE_ROWS = 1024
+# Once fewer than this share of rows is still undecided, later conditions only see those rows
+SUBSET_EVAL_FRACTION = 0.5
+# Below this size numexpr's setup cost outweighs its multi-threaded evaluation
+NUMEXPR_MIN_ROWS = 10000
+# Top-K selection replaces the full sort when offset + limit is under this share of the rows
+TOP_K_MAX_FRACTION = 0.25
+TOP_K_MIN_ROWS = 10000
+
+COMPARISON_OPERATORS = ["==", "!=", ">", "<", ">=", "<="]
+STRING_OPERATORS = ["contains", "startsWith", "endsWith", "icontains", "regex", "containsAny"]
+# Characters that make a pattern a regex; escaped the same way for Python re and Arrow's RE2
+REGEX_SPECIAL_CHARACTERS = set("\\.^$|?*+()[]{}")
+RANGE_OPERATORS = [">", "<", ">=", "<=", "between"]
+EQUALITY_OPERATORS = ["==", "!=", "in", "notIn"]
+
+# Indexed tables kept by tableKey, column indexes and sorted results kept across calls in this process
+TABLE_CACHE_MAX_ENTRIES = 8
+INDEX_CACHE_MAX_ENTRIES = 64
+RESULT_CACHE_MAX_ENTRIES = 32
 
 
 async def main(params: Inputs, context: Context) -> Outputs:
@@ -27,90 +74,112 @@ async def main(params: Inputs, context: Context) -> Outputs:
             "data": [],
             "filtered_count": 0,
             "total_count": 0,
-            "columns": []
+            "columns": [],
+            "next_cursor": None
         }
 
-    # Convert to DataFrame
-    df = pd.DataFrame(data)
+    index_options = params.get("index_options") or {}
+    use_index = bool(index_options.get("enabled", False))
+    table_key = index_options.get("tableKey")
+    index_stats = None
+
+    # Convert to DataFrame, reusing the cached frame of a keyed reference table.
+    # A caller-supplied tableVersion is trusted as is; otherwise the built frame is hashed.
+    table_version = None
+    table_fingerprint_ms = 0.0
+    if use_index and table_key is not None:
+        fingerprint = index_options.get("tableVersion")
+        fresh_df = None
+        if fingerprint is None:
+            fresh_df = pd.DataFrame(data)
+            started = time.perf_counter()
+            fingerprint = _table_fingerprint(fresh_df)
+            table_fingerprint_ms = (time.perf_counter() - started) * 1000
+        cached = TABLE_CACHE.get(table_key, str(fingerprint))
+        table_cache_hit = cached is not None
+        if cached is None:
+            cached = TABLE_CACHE.put(table_key, str(fingerprint), fresh_df if fresh_df is not None else pd.DataFrame(data))
+        df, table_version = cached
+    else:
+        df = pd.DataFrame(data)
+        table_cache_hit = False
     original_count = len(df)
 
-    # Apply conditions (filter rows)
+    # Apply offset and limit (pagination)
+    offset = params.get("offset") or 0
+    limit = params.get("limit")
+
     conditions = params.get("conditions") or []
-    for cond in conditions:
-        column = cond["column"]
-        operator = cond["operator"]
-        value = cond.get("value")
+    sort_by = params.get("sort_by") or []
+    sort_columns = [rule["column"] for rule in sort_by]
+    sort_ascending = [rule["order"] == "asc" for rule in sort_by]
 
-        if column not in df.columns:
-            raise ValueError(f"Column '{column}' not found in data")
+    # Validate columns exist
+    for col in sort_columns:
+        if col not in df.columns:
+            raise ValueError(f"Sort column '{col}' not found in data")
 
-        col_data = df[column]
+    # Keyset pagination resumes strictly after the last row of the previous page
+    signature = _query_signature(conditions, sort_by)
+    cursor = params.get("cursor")
+    cursor_state = decode_cursor(cursor, signature) if cursor else None
 
-        if operator == "==":
-            df = df[col_data == value]
-        elif operator == "!=":
-            df = df[col_data != value]
-        elif operator == ">":
-            df = df[col_data > value]
-        elif operator == "<":
-            df = df[col_data < value]
-        elif operator == ">=":
-            df = df[col_data >= value]
-        elif operator == "<=":
-            df = df[col_data <= value]
-        elif operator == "contains":
-            if not isinstance(value, str):
-                raise ValueError(f"'contains' operator requires string value")
-            df = df[col_data.astype(str).str.contains(value, na=False)]
-        elif operator == "startsWith":
-            if not isinstance(value, str):
-                raise ValueError(f"'startsWith' operator requires string value")
-            df = df[col_data.astype(str).str.startswith(value, na=False)]
-        elif operator == "endsWith":
-            if not isinstance(value, str):
-                raise ValueError(f"'endsWith' operator requires string value")
-            df = df[col_data.astype(str).str.endswith(value, na=False)]
-        elif operator == "in":
-            if not isinstance(value, list):
-                raise ValueError(f"'in' operator requires array value")
-            df = df[col_data.isin(value)]
-        elif operator == "notIn":
-            if not isinstance(value, list):
-                raise ValueError(f"'notIn' operator requires array value")
-            df = df[~col_data.isin(value)]
-        elif operator == "isNull":
-            df = df[col_data.isna()]
-        elif operator == "notNull":
-            df = df[col_data.notna()]
-        elif operator == "between":
-            if not isinstance(value, list) or len(value) != 2:
-                raise ValueError(f"'between' operator requires array of 2 values")
-            df = df[(col_data >= value[0]) & (col_data <= value[1])]
-        else:
-            raise ValueError(f"Unsupported operator: {operator}")
+    if use_index:
+        index_stats = {
+            "enabled": True,
+            "tableKey": table_key,
+            "tableCacheHit": table_cache_hit,
+            "resultCacheHit": False,
+            "lookups": 0,
+            "hits": 0,
+            "builds": 0,
+            "buildTimeMs": 0.0,
+            "fingerprintTimeMs": table_fingerprint_ms
+        }
 
-    # Apply sorting
-    sort_by = params.get("sort_by") or []
-    if sort_by:
-        sort_columns = [rule["column"] for rule in sort_by]
-        sort_ascending = [rule["order"] == "asc" for rule in sort_by]
+    # A keyed table keeps the full sorted result per query, so later pages skip filtering and sorting
+    result_key = (table_version, signature) if table_version is not None else None
+    cached_result = RESULT_CACHE.get(result_key) if result_key is not None else None
 
-        # Validate columns exist
-        for col in sort_columns:
-            if col not in df.columns:
-                raise ValueError(f"Sort column '{col}' not found in data")
+    if cached_result is not None:
+        index_stats["resultCacheHit"] = True
+        positions, ranks = cached_result
+        if cursor_state is not None:
+            positions = _resume_from_ranks(df, positions, ranks, cursor_state, sort_columns, sort_ascending, table_version)
+    else:
+        # Compile conditions into one tree and evaluate it as a single boolean mask
+        positions = np.arange(original_count)
+        if conditions:
+            condition_tree = compile_conditions(conditions, df, index_stats, table_version)
+            mask = evaluate_conditions(condition_tree, df)
+            positions = np.flatnonzero(mask)
 
-        df = df.sort_values(by=sort_columns, ascending=sort_ascending)
+        if result_key is not None:
+            # Sort everything once; every page of this query is then a slice
+            if sort_by:
+                positions = sort_positions(df, positions, sort_columns, sort_ascending)
+            ranks = np.full(original_count, -1, dtype=np.intp)
+            ranks[positions] = np.arange(len(positions))
+            RESULT_CACHE.put(result_key, (positions, ranks))
+            if cursor_state is not None:
+                positions = _resume_from_ranks(df, positions, ranks, cursor_state, sort_columns, sort_ascending, table_version)
+        else:
+            if cursor_state is not None:
+                positions = positions[_after_cursor(df, positions, cursor_state, sort_columns, sort_ascending)]
 
-    # Apply offset and limit (pagination)
-    offset = params.get("offset") or 0
-    limit = params.get("limit")
+            # Apply sorting on the matching rows only; one extra row tells whether another page exists
+            if sort_by:
+                top_k = offset + limit + 1 if limit else None
+                positions = sort_positions(df, positions, sort_columns, sort_ascending, top_k)
 
     if offset > 0:
-        df = df.iloc[offset:]
+        positions = positions[offset:]
 
+    next_cursor = None
     if limit:
-        df = df.head(limit)
+        if len(positions) > limit:
+            next_cursor = encode_cursor(df, positions[limit - 1], sort_columns, signature, table_version)
+        positions = positions[:limit]
 
     # Select specific columns
     selected_columns = params.get("columns")
@@ -121,13 +190,714 @@ async def main(params: Inputs, context: Context) -> Outputs:
                 raise ValueError(f"Column '{col}' not found in data")
         df = df[selected_columns]
 
-    # Convert back to list of dicts
+    # Take the final rows once and convert back to list of dicts
+    df = df.iloc[positions]
     result_data = df.to_dict('records')
     result_columns = df.columns.tolist()
 
-    return {
+    output: Outputs = {
         "data": result_data,
         "filtered_count": len(result_data),
         "total_count": original_count,
-        "columns": result_columns
+        "columns": result_columns,
+        "next_cursor": next_cursor
+    }
+    if index_stats is not None:
+        lookups = index_stats["lookups"]
+        index_stats["hitRate"] = round(index_stats["hits"] / lookups, 4) if lookups else None
+        index_stats["buildTimeMs"] = round(index_stats["buildTimeMs"], 3)
+        index_stats["fingerprintTimeMs"] = round(index_stats["fingerprintTimeMs"], 3)
+        index_stats["cache"] = INDEX_CACHE.stats()
+        index_stats["resultCache"] = RESULT_CACHE.stats()
+        output["index_stats"] = index_stats
+    return output
+
+
+class TableCache:
+    """Recently indexed reference tables, so repeated calls skip rebuilding the DataFrame."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, tuple[pd.DataFrame, str]] = OrderedDict()
+
+    def get(self, table_key: str, fingerprint: str) -> tuple[pd.DataFrame, str] | None:
+        """Cached frame and its version for table_key, if it was built from content with this fingerprint."""
+        entry = self.entries.get(table_key)
+        if entry is None:
+            return None
+        df, version = entry
+        if version != f"{table_key}#{fingerprint}":
+            del self.entries[table_key]
+            return None
+        self.entries.move_to_end(table_key)
+        return df, version
+
+    def put(self, table_key: str, fingerprint: str, df: pd.DataFrame) -> tuple[pd.DataFrame, str]:
+        # The version names the content, so indexes of a changed table are never reused
+        version = f"{table_key}#{fingerprint}"
+        self.entries[table_key] = (df, version)
+        self.entries.move_to_end(table_key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return df, version
+
+
+class SortedIndex:
+    """Row positions of a numeric column ordered by value, nulls excluded."""
+
+    def __init__(self, values: np.ndarray):
+        valid = np.flatnonzero(~np.isnan(values)) if values.dtype.kind == "f" else np.arange(len(values))
+        self.order = valid[np.argsort(values[valid], kind="stable")]
+        self.sorted_values = values[self.order]
+
+    def lookup(self, operator: str, value: typing.Any) -> np.ndarray:
+        """Positions of rows matching a range condition, found by binary search."""
+        sorted_values = self.sorted_values
+        if operator == ">":
+            start, stop = np.searchsorted(sorted_values, value, side="right"), len(sorted_values)
+        elif operator == ">=":
+            start, stop = np.searchsorted(sorted_values, value, side="left"), len(sorted_values)
+        elif operator == "<":
+            start, stop = 0, np.searchsorted(sorted_values, value, side="left")
+        elif operator == "<=":
+            start, stop = 0, np.searchsorted(sorted_values, value, side="right")
+        else:
+            start = np.searchsorted(sorted_values, value[0], side="left")
+            stop = max(start, np.searchsorted(sorted_values, value[1], side="right"))
+        return self.order[start:stop]
+
+
+class HashIndex:
+    """Row positions grouped by distinct value, nulls excluded."""
+
+    def __init__(self, series: pd.Series):
+        codes, uniques = pd.factorize(series)
+        self.uniques = pd.Index(uniques)
+        order = np.argsort(codes, kind="stable")
+        # Null rows carry code -1 and sort first; drop them
+        self.order = order[np.count_nonzero(codes < 0):]
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def lookup(self, values: list) -> np.ndarray:
+        """Positions of rows equal to any of the values."""
+        codes = self.uniques.get_indexer(values)
+        codes = np.unique(codes[codes >= 0])
+        if len(codes) == 0:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate([self.order[self.offsets[code]:self.offsets[code + 1]] for code in codes])
+
+
+class LRUCache:
+    """LRU cache with hit and miss counters, shared across calls in this process."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[tuple, typing.Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> typing.Any:
+        index = self.entries.get(key)
+        if index is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return index
+
+    def put(self, key: tuple, value: typing.Any) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / total, 4) if total else None
+        }
+
+
+TABLE_CACHE = TableCache(TABLE_CACHE_MAX_ENTRIES)
+# Column indexes keyed by (column fingerprint, column, kind)
+INDEX_CACHE = LRUCache(INDEX_CACHE_MAX_ENTRIES)
+# Sorted result positions and their ranks keyed by (table version, query signature)
+RESULT_CACHE = LRUCache(RESULT_CACHE_MAX_ENTRIES)
+
+
+def _query_signature(conditions: list[dict], sort_by: list[dict]) -> str:
+    """Stable hash of the conditions and sort rules a cursor belongs to."""
+    payload = json.dumps({"conditions": conditions, "sort_by": sort_by}, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+
+def _cursor_value(value: typing.Any) -> typing.Any:
+    """JSON-safe form of a sort key value; nulls become None."""
+    if value is None or (np.ndim(value) == 0 and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def encode_cursor(
+    df: pd.DataFrame,
+    position: int,
+    sort_columns: list[str],
+    signature: str,
+    table_version: str | None = None
+) -> str:
+    """Opaque cursor holding the last row's sort key values and its row position as tiebreaker."""
+    state = {
+        "query": signature,
+        "table": table_version,
+        "keys": [_cursor_value(df[col].iat[position]) for col in sort_columns],
+        "position": int(position)
     }
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode("ascii")
+
+
+def decode_cursor(cursor: str, signature: str) -> dict:
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, binascii.Error):
+        raise ValueError("Invalid cursor")
+    if not isinstance(state, dict) or state.get("query") != signature:
+        raise ValueError("Cursor was created for different conditions or sort rules")
+    return state
+
+
+def _after_cursor(
+    df: pd.DataFrame,
+    positions: np.ndarray,
+    cursor_state: dict,
+    sort_columns: list[str],
+    sort_ascending: list[bool]
+) -> np.ndarray:
+    """Mask of rows that sort strictly after the cursor row (nulls last, then row position)."""
+    after = positions > cursor_state["position"]
+    for col, ascending, key in reversed(list(zip(sort_columns, sort_ascending, cursor_state["keys"]))):
+        values = df[col].iloc[positions]
+        is_null = values.isna().to_numpy()
+        if key is None:
+            # Nothing sorts after a null except later null rows
+            beyond = np.zeros(len(positions), dtype=bool)
+            equal = is_null
+        else:
+            beyond = (values > key if ascending else values < key).to_numpy(dtype=bool, na_value=False) | is_null
+            equal = (values == key).to_numpy(dtype=bool, na_value=False)
+        after = beyond | (equal & after)
+    return after
+
+
+def _resume_from_ranks(
+    df: pd.DataFrame,
+    positions: np.ndarray,
+    ranks: np.ndarray,
+    cursor_state: dict,
+    sort_columns: list[str],
+    sort_ascending: list[bool],
+    table_version: str
+) -> np.ndarray:
+    """Rows after the cursor in a cached sorted result, found by the cursor row's rank."""
+    position = cursor_state["position"]
+    # Positions only identify the same row within the table version the cursor came from
+    if cursor_state.get("table") == table_version and 0 <= position < len(ranks) and ranks[position] >= 0:
+        return positions[ranks[position] + 1:]
+    return positions[_after_cursor(df, positions, cursor_state, sort_columns, sort_ascending)]
+
+
+def _table_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of every column, so any changed cell gives a new table version."""
+    digest = hashlib.blake2b(digest_size=16)
+    for column in df.columns:
+        digest.update(str(column).encode())
+        try:
+            digest.update(_column_fingerprint(df[column]).encode())
+        except TypeError:
+            # Unhashable cells (lists, dicts) are hashed through their pickled values
+            digest.update(pickle.dumps(df[column].tolist(), protocol=pickle.HIGHEST_PROTOCOL))
+    return digest.hexdigest()
+
+
+def _column_fingerprint(series: pd.Series) -> str:
+    """Content hash of a column; equal values and dtype give the same fingerprint."""
+    hashes = pd.util.hash_pandas_object(series, index=False).to_numpy()
+    digest = hashlib.blake2b(hashes.tobytes(), digest_size=16)
+    digest.update(str(series.dtype).encode())
+    return digest.hexdigest()
+
+
+def _index_kind(node: dict, df: pd.DataFrame) -> str | None:
+    """Which index can answer a leaf: 'sorted' for numeric ranges, 'hash' for equality and membership."""
+    series = df[node["column"]]
+    operator = node["operator"]
+    values = node["value"] if operator in ["in", "notIn", "between"] else [node["value"]]
+
+    if _is_numeric_column(series):
+        if not all(_is_number(value) for value in values):
+            return None
+        return "sorted" if operator in RANGE_OPERATORS else "hash" if operator in EQUALITY_OPERATORS else None
+
+    # Plain string equality on object columns; other types keep pandas comparison semantics
+    if operator in EQUALITY_OPERATORS and pd.api.types.is_object_dtype(series.dtype):
+        return "hash" if all(isinstance(value, str) for value in values) else None
+    return None
+
+
+def _attach_indexes(node: dict, df: pd.DataFrame, index_stats: dict, fingerprints: dict, table_version: str | None) -> None:
+    """Answer eligible leaves from cached indexes, building missing ones, and store their masks."""
+    if node["type"] in ["and", "or"]:
+        for child in node["children"]:
+            _attach_indexes(child, df, index_stats, fingerprints, table_version)
+        return
+    if node["type"] == "not":
+        _attach_indexes(node["child"], df, index_stats, fingerprints, table_version)
+        return
+
+    kind = _index_kind(node, df)
+    if kind is None:
+        return
+
+    column = node["column"]
+    if column not in fingerprints:
+        started = time.perf_counter()
+        if table_version is not None:
+            fingerprints[column] = table_version
+        else:
+            fingerprints[column] = _column_fingerprint(df[column])
+        index_stats["fingerprintTimeMs"] += (time.perf_counter() - started) * 1000
+
+    key = (fingerprints[column], column, kind)
+    index_stats["lookups"] += 1
+    index = INDEX_CACHE.get(key)
+    if index is None:
+        started = time.perf_counter()
+        index = SortedIndex(df[column].to_numpy()) if kind == "sorted" else HashIndex(df[column])
+        index_stats["buildTimeMs"] += (time.perf_counter() - started) * 1000
+        index_stats["builds"] += 1
+        INDEX_CACHE.put(key, index)
+    else:
+        index_stats["hits"] += 1
+
+    operator = node["operator"]
+    if kind == "sorted":
+        matched = index.lookup(operator, node["value"])
+    else:
+        matched = index.lookup(node["value"] if operator in ["in", "notIn"] else [node["value"]])
+
+    mask = np.zeros(len(df), dtype=bool)
+    mask[matched] = True
+    # Nulls are absent from both indexes, so they correctly end up True for != and notIn
+    node["index_mask"] = ~mask if operator in ["!=", "notIn"] else mask
+
+
+def sort_positions(
+    df: pd.DataFrame,
+    positions: np.ndarray,
+    sort_columns: list[str],
+    sort_ascending: list[bool],
+    top_k: int | None = None
+) -> np.ndarray:
+    """
+    Sort row positions by the sort columns, nulls last, ties in input order.
+
+    When only the first top_k rows are needed, a partial selection on the
+    first sort key first narrows the rows to those that can reach the top
+    k (every row tied with the k-th key value included), so the stable
+    sort of that candidate set matches the full sort exactly.
+    """
+    if top_k is not None and len(positions) >= TOP_K_MIN_ROWS and top_k < len(positions) * TOP_K_MAX_FRACTION:
+        keys = _ordinal_keys(df[sort_columns[0]].iloc[positions], sort_ascending[0])
+        if keys is not None:
+            kth = np.partition(keys, top_k - 1)[top_k - 1]
+            positions = positions[keys <= kth]
+
+    sort_frame = df[sort_columns].iloc[positions].set_axis(positions)
+    return sort_frame.sort_values(by=sort_columns, ascending=sort_ascending, kind="stable").index.to_numpy()
+
+
+def _ordinal_keys(series: pd.Series, ascending: bool) -> np.ndarray | None:
+    """Numeric keys where smaller means earlier in sort order and nulls sort last."""
+    values = series.to_numpy()
+    if isinstance(series.dtype, np.dtype) and (
+        pd.api.types.is_integer_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype)
+    ):
+        if pd.api.types.is_bool_dtype(series.dtype):
+            values = values.astype(np.int8)
+        if ascending:
+            return values
+        # Bitwise not reverses signed order without overflow
+        return ~values if pd.api.types.is_signed_integer_dtype(values.dtype) else np.iinfo(values.dtype).max - values
+
+    if isinstance(series.dtype, np.dtype) and pd.api.types.is_float_dtype(series.dtype):
+        keys = values if ascending else -values
+        return np.where(np.isnan(keys), np.inf, keys)
+
+    # Other types: rank by sorted factorization, which only sorts the distinct values
+    try:
+        codes, uniques = pd.factorize(series, sort=True)
+    except TypeError:
+        return None
+    keys = codes if ascending else len(uniques) - 1 - codes
+    return np.where(codes < 0, len(uniques), keys)
+
+
+def compile_conditions(
+    conditions: list[dict],
+    df: pd.DataFrame,
+    index_stats: dict | None = None,
+    table_version: str | None = None
+) -> dict:
+    """
+    Compile a condition list into an evaluation tree.
+
+    The top-level list is ANDed. Any entry may instead be a group:
+    {"and": [...]}, {"or": [...]} or {"not": {...}}, nested freely.
+    Children of each group are ordered by selectivity estimated on a
+    sample of rows, and numeric comparisons are fused into one numexpr
+    expression when numexpr is installed. With index_stats given, range,
+    equality and membership conditions are answered from cached indexes
+    and the lookups are counted in index_stats. Indexes are keyed by
+    table_version, itself a content hash of the table, when given and
+    otherwise by a content hash of the column.
+    """
+    tree = _compile_node({"and": conditions}, df)
+    if index_stats is not None:
+        _attach_indexes(tree, df, index_stats, {}, table_version)
+    sample_positions = np.unique(np.linspace(0, len(df) - 1, min(len(df), SELECTIVITY_SAMPLE_ROWS)).astype(np.intp))
+    _plan_node(tree, df, sample_positions)
+    return tree
+
+
+def evaluate_conditions(tree: dict, df: pd.DataFrame) -> np.ndarray:
+    """Evaluate a compiled condition tree to a boolean mask over all rows."""
+    return _evaluate_node(tree, df, None, {})
+
+
+def _compile_node(condition: dict, df: pd.DataFrame) -> dict:
+    if "and" in condition or "or" in condition:
+        kind = "and" if "and" in condition else "or"
+        children = condition[kind]
+        if not isinstance(children, list):
+            raise ValueError(f"'{kind}' group requires an array of conditions")
+        return {"type": kind, "children": [_compile_node(child, df) for child in children], "fused": []}
+
+    if "not" in condition:
+        child = condition["not"]
+        if not isinstance(child, dict):
+            raise ValueError("'not' group requires a single condition")
+        return {"type": "not", "child": _compile_node(child, df)}
+
+    column = condition.get("column")
+    operator = condition.get("operator")
+    value = condition.get("value")
+
+    if column not in df.columns:
+        raise ValueError(f"Column '{column}' not found in data")
+
+    node = {"type": "leaf", "column": column, "operator": operator, "value": value}
+
+    if operator == "containsAny":
+        if not isinstance(value, list) or not value or not all(isinstance(v, str) and v for v in value):
+            raise ValueError(f"'containsAny' operator requires array of non-empty strings")
+        # All keywords matched in one pass by a trie-shaped alternation
+        _compile_pattern(node, _keyword_pattern(value))
+    elif operator in STRING_OPERATORS:
+        if not isinstance(value, str):
+            raise ValueError(f"'{operator}' operator requires string value")
+        if operator == "regex" or (operator == "contains" and any(ch in REGEX_SPECIAL_CHARACTERS for ch in value)):
+            _compile_pattern(node, value)
+    elif operator in ["in", "notIn"]:
+        if not isinstance(value, list):
+            raise ValueError(f"'{operator}' operator requires array value")
+    elif operator == "between":
+        if not isinstance(value, list) or len(value) != 2:
+            raise ValueError(f"'between' operator requires array of 2 values")
+    elif operator not in COMPARISON_OPERATORS and operator not in ["isNull", "notNull"]:
+        raise ValueError(f"Unsupported operator: {operator}")
+
+    return node
+
+
+def _compile_pattern(node: dict, pattern: str) -> None:
+    """Compile a leaf's regex once and check whether Arrow's RE2 engine accepts it."""
+    try:
+        node["pattern"] = re.compile(pattern)
+    except re.error as e:
+        raise ValueError(f"Invalid regex pattern '{pattern}': {e}")
+    node["arrow_pattern"] = False
+    if pc is not None:
+        try:
+            pc.match_substring_regex(pa.array([""], pa.large_string()), pattern)
+            node["arrow_pattern"] = True
+        except pa.ArrowInvalid:
+            pass
+
+
+def _keyword_pattern(keywords: list[str]) -> str:
+    """
+    Regex matching any keyword, with shared prefixes factored into a trie.
+
+    ["error", "errno", "fail"] becomes "(?:err(?:no|or)|fail)", so the regex
+    engine walks each text once like an Aho-Corasick automaton instead of
+    retrying every keyword at every position.
+    """
+    trie: dict = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        is_end = "" in node
+        branches = [
+            ("\\" + ch if ch in REGEX_SPECIAL_CHARACTERS else ch) + build(child)
+            for ch, child in sorted(node.items()) if ch != ""
+        ]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not is_end:
+            return branches[0]
+        # A keyword ending here already matched, so the longer continuations are optional
+        return "(?:" + "|".join(branches) + ")" + ("?" if is_end else "")
+
+    return build(trie)
+
+
+def _is_number(value: typing.Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _is_numeric_column(series: pd.Series) -> bool:
+    """Plain numpy numeric column that can be compared without pandas overhead."""
+    return (
+        isinstance(series.dtype, np.dtype)
+        and pd.api.types.is_numeric_dtype(series.dtype)
+        and not pd.api.types.is_bool_dtype(series.dtype)
+    )
+
+
+def _is_fusable(node: dict, df: pd.DataFrame) -> bool:
+    """Whether a leaf is a numeric comparison numexpr can evaluate."""
+    if node["type"] != "leaf" or "index_mask" in node or not _is_numeric_column(df[node["column"]]):
+        return False
+    if node["operator"] in COMPARISON_OPERATORS:
+        return _is_number(node["value"])
+    if node["operator"] == "between":
+        return all(_is_number(bound) for bound in node["value"])
+    return False
+
+
+def _operator_cost(node: dict) -> int:
+    """Relative evaluation cost, used to break selectivity ties."""
+    if node["type"] != "leaf":
+        return 4
+    if node["operator"] in ["regex", "containsAny"]:
+        return 3
+    if node["operator"] in STRING_OPERATORS:
+        return 2
+    if node["operator"] in ["in", "notIn"]:
+        return 1
+    return 0
+
+
+def _plan_node(node: dict, df: pd.DataFrame, sample_positions: np.ndarray) -> float:
+    """Estimate selectivity bottom-up, order group children and fuse numeric leaves."""
+    kind = node["type"]
+    if kind == "leaf":
+        mask = _evaluate_node(node, df, sample_positions, {})
+        node["selectivity"] = float(mask.mean()) if len(mask) else 1.0
+    elif kind == "not":
+        node["selectivity"] = 1.0 - _plan_node(node["child"], df, sample_positions)
+    else:
+        selectivities = [_plan_node(child, df, sample_positions) for child in node["children"]]
+        if kind == "and":
+            node["selectivity"] = float(np.prod(selectivities)) if selectivities else 1.0
+            # Most selective first: each later condition sees fewer undecided rows
+            node["children"].sort(key=lambda child: (child["selectivity"], _operator_cost(child)))
+        else:
+            node["selectivity"] = 1.0 - float(np.prod([1.0 - s for s in selectivities])) if selectivities else 0.0
+            # Least selective first: rows already matched need no further checks
+            node["children"].sort(key=lambda child: (-child["selectivity"], _operator_cost(child)))
+
+        if numexpr is not None and len(df) >= NUMEXPR_MIN_ROWS:
+            fusable = [child for child in node["children"] if _is_fusable(child, df)]
+            if len(fusable) > 1:
+                node["fused"] = fusable
+                node["children"] = [child for child in node["children"] if not _is_fusable(child, df)]
+    return node["selectivity"]
+
+
+def _evaluate_node(node: dict, df: pd.DataFrame, rows: np.ndarray | None, string_cache: dict) -> np.ndarray:
+    """Evaluate a node over all rows (rows=None) or over the given row positions."""
+    kind = node["type"]
+    if kind == "leaf":
+        return _evaluate_leaf(node, df, rows, string_cache)
+    if kind == "not":
+        return ~_evaluate_node(node["child"], df, rows, string_cache)
+
+    is_and = kind == "and"
+    size = len(df) if rows is None else len(rows)
+    result = np.full(size, is_and)
+    if node["fused"]:
+        result = _evaluate_fused(node["fused"], is_and, df, rows)
+
+    for child in node["children"]:
+        # Undecided rows: still True under AND, still False under OR
+        undecided = np.flatnonzero(result) if is_and else np.flatnonzero(~result)
+        if len(undecided) == 0:
+            break
+        if len(undecided) < size * SUBSET_EVAL_FRACTION:
+            subset = undecided if rows is None else rows[undecided]
+            result[undecided] = _evaluate_node(child, df, subset, string_cache)
+        elif is_and:
+            result &= _evaluate_node(child, df, rows, string_cache)
+        else:
+            result |= _evaluate_node(child, df, rows, string_cache)
+    return result
+
+
+def _evaluate_fused(leaves: list[dict], is_and: bool, df: pd.DataFrame, rows: np.ndarray | None) -> np.ndarray:
+    """Evaluate numeric comparison leaves as one numexpr expression."""
+    terms = []
+    local_dict = {}
+    for i, leaf in enumerate(leaves):
+        values = df[leaf["column"]].to_numpy()
+        local_dict[f"c{i}"] = values if rows is None else values[rows]
+        if leaf["operator"] == "between":
+            local_dict[f"lo{i}"], local_dict[f"hi{i}"] = leaf["value"]
+            terms.append(f"((c{i} >= lo{i}) & (c{i} <= hi{i}))")
+        else:
+            local_dict[f"v{i}"] = leaf["value"]
+            terms.append(f"(c{i} {leaf['operator']} v{i})")
+    expression = (" & " if is_and else " | ").join(terms)
+    return numexpr.evaluate(expression, local_dict=local_dict)
+
+
+def _string_values(column: str, df: pd.DataFrame, rows: np.ndarray | None, string_cache: dict) -> typing.Any:
+    """
+    String form of a column with nulls kept as nulls, converted once per column.
+
+    Returns an Arrow string array when pyarrow is installed, otherwise a
+    pandas Series of str. Every string condition on the column reuses it.
+    """
+    if column not in string_cache and rows is None:
+        string_cache[column] = _to_strings(df[column])
+    if column in string_cache:
+        cached = string_cache[column]
+        if rows is None:
+            return cached
+        return cached.take(pa.array(rows)) if pa is not None else cached.iloc[rows]
+    return _to_strings(df[column].iloc[rows])
+
+
+def _to_strings(series: pd.Series) -> typing.Any:
+    is_null = series.isna().to_numpy()
+    strings = series.astype(str)
+    if pa is not None:
+        return pa.array(strings.to_numpy(dtype=object), type=pa.large_string(), mask=is_null)
+    return strings.where(~is_null)
+
+
+def _match_strings(node: dict, strings: typing.Any) -> np.ndarray:
+    """Evaluate a string operator with Arrow compute kernels, falling back to pandas."""
+    operator = node["operator"]
+    value = node["value"]
+    pattern = node.get("pattern")
+
+    if pa is not None and (pattern is None or node["arrow_pattern"]):
+        if pattern is not None:
+            result = pc.match_substring_regex(strings, pattern.pattern)
+        elif operator == "contains":
+            result = pc.match_substring(strings, value)
+        elif operator == "icontains":
+            result = pc.match_substring(strings, value, ignore_case=True)
+        elif operator == "startsWith":
+            result = pc.starts_with(strings, value)
+        else:
+            result = pc.ends_with(strings, value)
+        return pc.fill_null(result, False).to_numpy(zero_copy_only=False)
+
+    if pa is not None:
+        # Patterns RE2 rejects (e.g. lookarounds) run through Python's re engine
+        strings = pd.Series(strings.to_pandas(), dtype=object)
+    if pattern is not None:
+        mask = strings.str.contains(pattern, na=False)
+    elif operator == "contains":
+        mask = strings.str.contains(value, regex=False, na=False)
+    elif operator == "icontains":
+        mask = strings.str.contains(value, case=False, regex=False, na=False)
+    elif operator == "startsWith":
+        mask = strings.str.startswith(value, na=False)
+    else:
+        mask = strings.str.endswith(value, na=False)
+    return mask.to_numpy(dtype=bool, na_value=False)
+
+
+def _evaluate_leaf(node: dict, df: pd.DataFrame, rows: np.ndarray | None, string_cache: dict) -> np.ndarray:
+    column = node["column"]
+    operator = node["operator"]
+    value = node["value"]
+
+    if "index_mask" in node:
+        return node["index_mask"] if rows is None else node["index_mask"][rows]
+
+    col_data = df[column] if rows is None else df[column].iloc[rows]
+
+    # Numeric columns compare directly on the numpy array
+    if _is_numeric_column(col_data) and (
+        (operator in COMPARISON_OPERATORS and _is_number(value))
+        or (operator == "between" and all(_is_number(bound) for bound in value))
+    ):
+        values = col_data.to_numpy()
+        if operator == "==":
+            return values == value
+        elif operator == "!=":
+            return values != value
+        elif operator == ">":
+            return values > value
+        elif operator == "<":
+            return values < value
+        elif operator == ">=":
+            return values >= value
+        elif operator == "<=":
+            return values <= value
+        else:
+            return (values >= value[0]) & (values <= value[1])
+
+    if operator == "==":
+        mask = col_data == value
+    elif operator == "!=":
+        mask = col_data != value
+    elif operator == ">":
+        mask = col_data > value
+    elif operator == "<":
+        mask = col_data < value
+    elif operator == ">=":
+        mask = col_data >= value
+    elif operator == "<=":
+        mask = col_data <= value
+    elif operator in STRING_OPERATORS:
+        return _match_strings(node, _string_values(column, df, rows, string_cache))
+    elif operator == "in":
+        mask = col_data.isin(value)
+    elif operator == "notIn":
+        mask = ~col_data.isin(value)
+    elif operator == "isNull":
+        mask = col_data.isna()
+    elif operator == "notNull":
+        mask = col_data.notna()
+    elif operator == "between":
+        mask = (col_data >= value[0]) & (col_data <= value[1])
+    else:
+        raise ValueError(f"Unsupported operator: {operator}")
+
+    return mask.to_numpy(dtype=bool, na_value=False)
@@ -1,70 +1,137 @@
 #region generated meta
 import typing
 class Inputs(typing.TypedDict):
-    data: list[dict]
+    data: list[dict] | None
     inspect_level: typing.Literal["basic", "detailed", "quality"] | None
+    params: dict | None
+    profiles: list[dict] | None
 class Outputs(typing.TypedDict):
     summary: typing.NotRequired[dict]
     columns: typing.NotRequired[list[dict]]
     quality: typing.NotRequired[dict]
     preview: typing.NotRequired[list[dict]]
+    profile: typing.NotRequired[dict]
 #endregion
 
 from oocana import Context
 import pandas as pd
+import numpy as np
+import base64
+import math
 import sys
+from statistics import NormalDist
+
+# Rows hashed or sketched per batch in approximate mode
+SKETCH_BATCH_ROWS = 65536
+
+# Version of the serialized profile state emitted in the 'profile' output
+PROFILE_VERSION = 1
 
 
 async def main(params: Inputs, context: Context) -> Outputs:
     """Inspect table structure and data quality."""
 
-    data = params["data"]
-    if not data:
+    data = params.get("data") or []
+    profiles = params.get("profiles") or []
+    if not data and not profiles:
         raise ValueError("Input data is empty")
 
     inspect_level = params.get("inspect_level") or "basic"
+    inspect_params = params.get("params") or {}
+
+    # Approximate mode replaces exact distinct counts and quantiles with sketches
+    approximate = bool(inspect_params.get("approximate", False))
+    distinct_error = inspect_params.get("distinctError", 0.01)
+    quantile_error = inspect_params.get("quantileError", 0.01)
+    percentiles = inspect_params.get("percentiles") or [0.25, 0.5, 0.75]
+    seed = inspect_params.get("seed")
+
+    # Profile state is emitted on request and always when merging earlier profiles
+    emit_profile = bool(inspect_params.get("emitProfile", False)) or bool(profiles)
+    row_hash_limit = inspect_params.get("rowHashLimit", 1_000_000)
+
+    # Sampled mode extrapolates object memory from a subset of rows instead of sizing every value
+    memory_mode = inspect_params.get("memoryMode") or "deep"
+    memory_sample_rows = inspect_params.get("memorySampleRows", 10000)
+    memory_confidence = inspect_params.get("memoryConfidence", 0.95)
+    memory_breakdown = inspect_params.get("memoryBreakdown")
+    if memory_breakdown is None:
+        memory_breakdown = memory_mode == "sampled"
+
+    if not 0 < distinct_error < 1:
+        raise ValueError(f"'distinctError' must be between 0 and 1, got {distinct_error}")
+    if not 0 < quantile_error < 1:
+        raise ValueError(f"'quantileError' must be between 0 and 1, got {quantile_error}")
+    for q in percentiles:
+        if not 0 <= q <= 1:
+            raise ValueError(f"Percentiles must be between 0 and 1, got {q}")
+    if row_hash_limit < 0:
+        raise ValueError(f"'rowHashLimit' must be non-negative, got {row_hash_limit}")
+    if memory_mode not in ["deep", "sampled"]:
+        raise ValueError(f"Invalid memoryMode: {memory_mode}. Must be one of: deep, sampled")
+    if memory_sample_rows < 2:
+        raise ValueError(f"'memorySampleRows' must be at least 2, got {memory_sample_rows}")
+    if not 0 < memory_confidence < 1:
+        raise ValueError(f"'memoryConfidence' must be between 0 and 1, got {memory_confidence}")
 
     # Convert to DataFrame for analysis
     df = pd.DataFrame(data)
 
     # Calculate memory usage
-    memory_bytes = df.memory_usage(deep=True).sum()
-    if memory_bytes < 1024:
-        memory_str = f"{memory_bytes} B"
-    elif memory_bytes < 1024 * 1024:
-        memory_str = f"{memory_bytes / 1024:.1f} KB"
-    else:
-        memory_str = f"{memory_bytes / (1024 * 1024):.1f} MB"
+    memory = None
+    if data:
+        memory = estimate_memory(
+            df, memory_mode, memory_sample_rows, memory_confidence, memory_breakdown, distinct_error, seed
+        )
+
+    profile = None
+    if emit_profile:
+        # Earlier chunks come first, this call's data is appended last
+        for other in profiles:
+            profile = other if profile is None else merge_profiles(profile, other, row_hash_limit, seed)
+        if data:
+            chunk_profile = build_profile(
+                df, distinct_error, quantile_error, row_hash_limit, seed, memory_bytes=memory["bytes"]
+            )
+            profile = chunk_profile if profile is None else merge_profiles(profile, chunk_profile, row_hash_limit, seed)
+        _check_profile(profile)
+
+    if profiles:
+        # The union is only known through merged profile state, so report from it
+        summary, columns_info, quality, preview = report_profile(profile, inspect_level, percentiles, seed)
+        return {
+            "summary": summary,
+            "columns": columns_info,
+            "quality": quality,
+            "preview": preview,
+            "profile": profile
+        }
 
     # Summary statistics
     summary = {
         "rowCount": len(df),
         "columnCount": len(df.columns),
-        "memoryUsage": memory_str
+        "memoryUsage": _format_bytes(memory["bytes"]),
+        "approximate": approximate
     }
+    if memory_mode == "sampled" or memory_breakdown:
+        summary["memory"] = {key: value for key, value in memory.items() if key != "columns"}
 
     # Column-level statistics
     columns_info = []
     for col in df.columns:
         col_data = df[col]
-
-        # Determine data type
-        dtype_str = str(col_data.dtype)
-        if pd.api.types.is_numeric_dtype(col_data):
-            data_type = "number"
-        elif pd.api.types.is_datetime64_any_dtype(col_data):
-            data_type = "date"
-        elif pd.api.types.is_bool_dtype(col_data):
-            data_type = "boolean"
-        elif pd.api.types.is_string_dtype(col_data) or pd.api.types.is_object_dtype(col_data):
-            data_type = "string"
-        else:
-            data_type = "mixed"
+        data_type = _column_type(col_data)
 
         # Basic stats
         null_count = int(col_data.isna().sum())
-        unique_count = int(col_data.nunique())
         null_percent = (null_count / len(df) * 100) if len(df) > 0 else 0
+        if approximate:
+            hll = HyperLogLog.for_error(distinct_error)
+            hll.update_series(col_data)
+            unique_count = min(int(round(hll.estimate())), len(df) - null_count)
+        else:
+            unique_count = int(col_data.nunique())
 
         # Sample values
         sample_values = col_data.dropna().head(5).tolist()
@@ -77,6 +144,12 @@ async def main(params: Inputs, context: Context) -> Outputs:
             "nullPercent": round(null_percent, 2),
             "sampleValues": sample_values
         }
+        if approximate:
+            col_info["approximation"] = {
+                "uniqueCount": hll.error_bounds(unique_count)
+            }
+        if memory_breakdown:
+            col_info["memory"] = memory["columns"][col]
 
         # Detailed statistics for numeric columns
         if inspect_level in ["detailed", "quality"] and data_type == "number":
@@ -84,9 +157,15 @@ async def main(params: Inputs, context: Context) -> Outputs:
                 "min": float(col_data.min()) if not col_data.empty else None,
                 "max": float(col_data.max()) if not col_data.empty else None,
                 "mean": float(col_data.mean()) if not col_data.empty else None,
-                "median": float(col_data.median()) if not col_data.empty else None,
+                "median": None,
                 "std": float(col_data.std()) if not col_data.empty else None
             }
+            if approximate:
+                kll = KLLSketch.for_error(quantile_error, seed=seed)
+                kll.update_series(col_data)
+                _add_quantile_stats(col_info, kll, percentiles)
+            elif not col_data.empty:
+                col_info["stats"]["median"] = float(col_data.median())
 
         columns_info.append(col_info)
 
@@ -100,28 +179,741 @@ async def main(params: Inputs, context: Context) -> Outputs:
         # Check for duplicate rows
         duplicate_rows = int(df.duplicated().sum())
 
-        # Identify issues
-        issues = []
-        if completeness < 90:
-            issues.append(f"Low completeness: {completeness:.1f}%")
-        if duplicate_rows > 0:
-            issues.append(f"{duplicate_rows} duplicate rows found")
-        for col_info in columns_info:
-            if col_info["nullPercent"] > 50:
-                issues.append(f"Column '{col_info['name']}' has {col_info['nullPercent']:.1f}% missing values")
-
         quality = {
             "completeness": round(completeness, 2),
             "duplicateRows": duplicate_rows,
-            "issues": issues
+            "issues": _quality_issues(completeness, duplicate_rows, columns_info)
         }
 
     # Preview (first 10 rows)
     preview = df.head(10).to_dict('records')
 
-    return {
+    output: Outputs = {
         "summary": summary,
         "columns": columns_info,
         "quality": quality,
         "preview": preview
     }
+    if profile is not None:
+        output["profile"] = profile
+    return output
+
+
+def _format_bytes(memory_bytes: int) -> str:
+    """Format a byte count as B, KB or MB."""
+    if memory_bytes < 1024:
+        return f"{memory_bytes} B"
+    elif memory_bytes < 1024 * 1024:
+        return f"{memory_bytes / 1024:.1f} KB"
+    else:
+        return f"{memory_bytes / (1024 * 1024):.1f} MB"
+
+
+def _column_type(col_data: pd.Series) -> str:
+    """Map a column dtype to number, date, boolean, string or mixed."""
+    if pd.api.types.is_numeric_dtype(col_data):
+        return "number"
+    elif pd.api.types.is_datetime64_any_dtype(col_data):
+        return "date"
+    elif pd.api.types.is_bool_dtype(col_data):
+        return "boolean"
+    elif pd.api.types.is_string_dtype(col_data) or pd.api.types.is_object_dtype(col_data):
+        return "string"
+    else:
+        return "mixed"
+
+
+def _quality_issues(completeness: float, duplicate_rows: int, columns_info: list[dict]) -> list[str]:
+    """Identify data quality issues."""
+    issues = []
+    if completeness < 90:
+        issues.append(f"Low completeness: {completeness:.1f}%")
+    if duplicate_rows > 0:
+        issues.append(f"{duplicate_rows} duplicate rows found")
+    for col_info in columns_info:
+        if col_info["nullPercent"] > 50:
+            issues.append(f"Column '{col_info['name']}' has {col_info['nullPercent']:.1f}% missing values")
+    return issues
+
+
+def _add_quantile_stats(col_info: dict, kll: "KLLSketch", percentiles: list[float]) -> None:
+    """Fill median and percentiles from a quantile sketch and report its error."""
+    if kll.count > 0:
+        quantiles = kll.quantiles([0.5] + list(percentiles))
+        col_info["stats"]["median"] = quantiles[0]
+        col_info["stats"]["percentiles"] = {
+            _percentile_label(q): value for q, value in zip(percentiles, quantiles[1:])
+        }
+    col_info.setdefault("approximation", {})["quantiles"] = {
+        "method": "kll",
+        "k": kll.k,
+        "rankError": round(kll.rank_error, 6)
+    }
+
+
+def estimate_memory(
+    df: pd.DataFrame,
+    mode: str,
+    sample_rows: int,
+    confidence: float,
+    breakdown: bool,
+    distinct_error: float,
+    seed: int | None = None
+) -> dict:
+    """
+    Estimate deep memory usage of a DataFrame.
+
+    Fixed-width columns are sized exactly. In sampled mode, object columns are
+    sized from a random subset of rows and extrapolated, with a confidence
+    interval from the sample variance. With breakdown enabled, each column also
+    gets the projected footprint after conversion to category, Arrow string or
+    a downcast numeric dtype.
+    """
+    row_count = len(df)
+    positions = None
+    if mode == "sampled" and row_count > sample_rows:
+        rng = np.random.default_rng(seed)
+        positions = np.sort(rng.choice(row_count, size=sample_rows, replace=False))
+
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    total = float(df.index.memory_usage(deep=True))
+    variance = 0.0
+    columns = {}
+    for col in df.columns:
+        col_data = df[col]
+        value_sizes = None
+        if _is_object_backed(col_data) and (mode == "sampled" or breakdown):
+            sample = col_data if positions is None else col_data.iloc[positions]
+            # Matches pandas deep accounting: one pointer plus the object's own size per row
+            value_sizes = np.fromiter((value.__sizeof__() for value in sample), dtype=np.float64, count=len(sample))
+            col_bytes = row_count * (8 + value_sizes.mean()) if len(value_sizes) else 0.0
+            if positions is not None and len(value_sizes) > 1:
+                # Standard error of the extrapolated total, with finite population correction
+                variance += (row_count ** 2) * value_sizes.var(ddof=1) / len(sample) * (1 - len(sample) / row_count)
+        else:
+            col_bytes = float(col_data.memory_usage(deep=True, index=False))
+        total += col_bytes
+
+        if breakdown:
+            columns[col] = _column_memory(col_data, col_bytes, value_sizes, positions, distinct_error)
+
+    margin = z * math.sqrt(variance)
+    memory: dict[str, typing.Any] = {
+        "method": "sampled" if positions is not None else "exact",
+        "bytes": int(round(total)),
+        "sampleRows": len(positions) if positions is not None else row_count,
+        "confidence": confidence,
+        "lower": int(max(0, math.floor(total - margin))),
+        "upper": int(math.ceil(total + margin)),
+        "relativeError": round(margin / total, 6) if total > 0 else 0.0
+    }
+    if breakdown:
+        memory["columns"] = columns
+        memory["potentialSavings"] = int(sum(info["potentialSavings"] for info in columns.values()))
+    return memory
+
+
+def _is_object_backed(col_data: pd.Series) -> bool:
+    """Whether a column stores Python objects that deep memory accounting must size one by one."""
+    dtype = col_data.dtype
+    return pd.api.types.is_object_dtype(dtype) or (isinstance(dtype, pd.StringDtype) and dtype.storage == "python")
+
+
+def _column_memory(
+    col_data: pd.Series,
+    col_bytes: float,
+    value_sizes: np.ndarray | None,
+    positions: np.ndarray | None,
+    distinct_error: float
+) -> dict:
+    """Current footprint of one column and projections for cheaper dtypes."""
+    row_count = len(col_data)
+    projections: dict[str, typing.Any] = {}
+
+    if not pd.api.types.is_bool_dtype(col_data):
+        if positions is not None:
+            # Sampled mode never scans the full column, so distinct values are extrapolated from the sample
+            distinct = max(1, min(_sample_distinct(col_data.iloc[positions], row_count), row_count))
+        else:
+            hll = HyperLogLog.for_error(distinct_error)
+            hll.update_series(col_data)
+            distinct = max(1, min(int(round(hll.estimate())), row_count))
+        if value_sizes is not None:
+            value_bytes = 8 + (value_sizes.mean() if len(value_sizes) else 0.0)
+        else:
+            value_bytes = col_data.dtype.itemsize if hasattr(col_data.dtype, "itemsize") else 8
+        # Category codes are the smallest signed integer holding every category
+        code_bytes = 1 if distinct < 2 ** 7 else 2 if distinct < 2 ** 15 else 4 if distinct < 2 ** 31 else 8
+        projections["category"] = {
+            "dtype": "category",
+            "bytes": int(row_count * code_bytes + distinct * value_bytes),
+            "distinctEstimate": distinct
+        }
+
+    if value_sizes is not None:
+        sample = col_data if positions is None else col_data.iloc[positions]
+        non_null = sample.dropna()
+        if len(non_null) and all(isinstance(value, str) for value in non_null):
+            utf8_bytes = np.fromiter((len(value.encode("utf-8")) for value in non_null), dtype=np.float64, count=len(non_null))
+            non_null_share = len(non_null) / len(sample)
+            # large_string layout: 64-bit offsets, UTF-8 data and a validity bitmap
+            projections["arrowString"] = {
+                "dtype": "string[pyarrow]",
+                "bytes": int(row_count * 8 + row_count * non_null_share * utf8_bytes.mean() + math.ceil(row_count / 8))
+            }
+
+    downcast_dtype = _downcast_dtype(col_data)
+    if downcast_dtype is not None:
+        projections["downcast"] = {
+            "dtype": str(downcast_dtype),
+            "bytes": int(row_count * downcast_dtype.itemsize)
+        }
+
+    for projection in projections.values():
+        projection["savings"] = int(max(0, col_bytes - projection["bytes"]))
+    best = max(projections, key=lambda name: projections[name]["savings"], default=None)
+    if best is not None and projections[best]["savings"] == 0:
+        best = None
+
+    return {
+        "dtype": str(col_data.dtype),
+        "bytes": int(round(col_bytes)),
+        "projections": projections,
+        "recommended": best,
+        "potentialSavings": projections[best]["savings"] if best else 0
+    }
+
+
+def _sample_distinct(sample: pd.Series, row_count: int) -> int:
+    """
+    Distinct-value estimate for a whole column from a uniform row sample (Chao1 estimator).
+
+    Values seen once or twice in the sample indicate how many values it missed entirely.
+    """
+    frequencies = sample.value_counts(dropna=True).to_numpy()
+    singletons = int((frequencies == 1).sum())
+    doubletons = int((frequencies == 2).sum())
+    if doubletons:
+        unseen = singletons ** 2 / (2 * doubletons)
+    else:
+        unseen = singletons * (singletons - 1) / 2
+    return int(min(round(len(frequencies) + unseen), row_count))
+
+
+def _downcast_dtype(col_data: pd.Series) -> np.dtype | None:
+    """Smallest numeric dtype that holds every value of an int or float column losslessly."""
+    dtype = col_data.dtype
+    if not isinstance(dtype, np.dtype) or pd.api.types.is_bool_dtype(dtype):
+        return None
+
+    if pd.api.types.is_integer_dtype(dtype):
+        if col_data.empty:
+            return None
+        low, high = int(col_data.min()), int(col_data.max())
+        candidates = ["uint8", "uint16", "uint32"] if low >= 0 else ["int8", "int16", "int32"]
+        for name in candidates:
+            info = np.iinfo(name)
+            if info.min <= low and high <= info.max and np.dtype(name).itemsize < dtype.itemsize:
+                return np.dtype(name)
+        return None
+
+    if pd.api.types.is_float_dtype(dtype) and dtype.itemsize > 4:
+        values = col_data.to_numpy()
+        with np.errstate(over="ignore"):
+            as_float32 = values.astype(np.float32).astype(dtype)
+        if np.array_equal(as_float32, values, equal_nan=True):
+            return np.dtype("float32")
+    return None
+
+
+def build_profile(
+    df: pd.DataFrame,
+    distinct_error: float,
+    quantile_error: float,
+    row_hash_limit: int,
+    seed: int | None = None,
+    memory_bytes: int | None = None
+) -> dict:
+    """Build mergeable, JSON-serializable profile state for one chunk of rows."""
+    columns = []
+    for col in df.columns:
+        col_data = df[col]
+        non_null = col_data.dropna()
+
+        hll = HyperLogLog.for_error(distinct_error)
+        hll.update_series(col_data)
+
+        data_type = _column_type(col_data)
+        numeric = None
+        if data_type == "number":
+            values = non_null.to_numpy(dtype="float64")
+            kll = KLLSketch.for_error(quantile_error, seed=seed)
+            kll.update_series(non_null)
+            total = float(values.sum()) if len(values) else 0.0
+            mean = total / len(values) if len(values) else 0.0
+            numeric = {
+                "count": len(values),
+                "sum": total,
+                # Sum of squared deviations from the mean, merged with Chan's formula
+                "m2": float(((values - mean) ** 2).sum()) if len(values) else 0.0,
+                "min": float(values.min()) if len(values) else None,
+                "max": float(values.max()) if len(values) else None,
+                "quantiles": kll.to_dict()
+            }
+
+        columns.append({
+            "name": col,
+            "type": data_type,
+            "nonNullCount": len(non_null),
+            "nullCount": len(col_data) - len(non_null),
+            "distinct": hll.to_dict(),
+            "numeric": numeric,
+            "sampleValues": non_null.head(5).tolist()
+        })
+
+    # Row hashes detect duplicates across chunks; exact until the limit, then HyperLogLog
+    row_hll = HyperLogLog.for_error(distinct_error)
+    row_hashes = []
+    for start in range(0, len(df), SKETCH_BATCH_ROWS):
+        batch_hashes = _row_hashes(df.iloc[start:start + SKETCH_BATCH_ROWS])
+        row_hll.update_hashes(batch_hashes)
+        row_hashes.append(np.unique(batch_hashes))
+    distinct_rows = np.unique(np.concatenate(row_hashes)) if row_hashes else np.empty(0, dtype=np.uint64)
+
+    return {
+        "version": PROFILE_VERSION,
+        "rowCount": len(df),
+        "memoryBytes": int(df.memory_usage(deep=True).sum()) if memory_bytes is None else int(memory_bytes),
+        "columns": columns,
+        "rows": {
+            "hashes": _encode_uint64(distinct_rows) if len(distinct_rows) <= row_hash_limit else None,
+            "distinct": row_hll.to_dict()
+        },
+        "preview": df.head(10).to_dict('records')
+    }
+
+
+def merge_profiles(left: dict, right: dict, row_hash_limit: int, seed: int | None = None) -> dict:
+    """Merge two profiles into the profile of their union, with left's rows first."""
+    _check_profile(left)
+    _check_profile(right)
+
+    left_columns = {col["name"]: col for col in left["columns"]}
+    right_columns = {col["name"]: col for col in right["columns"]}
+    names = list(left_columns) + [name for name in right_columns if name not in left_columns]
+
+    columns = []
+    for name in names:
+        # A column missing from one side counts as null for all of that side's rows
+        left_col = left_columns.get(name) or _null_column_profile(name, left["rowCount"], right_columns[name])
+        right_col = right_columns.get(name) or _null_column_profile(name, right["rowCount"], left_columns[name])
+        columns.append(_merge_column_profiles(left_col, right_col, seed))
+
+    row_hll = HyperLogLog.from_dict(left["rows"]["distinct"])
+    row_hll.merge(HyperLogLog.from_dict(right["rows"]["distinct"]))
+    row_hashes = None
+    if left["rows"]["hashes"] is not None and right["rows"]["hashes"] is not None:
+        merged_hashes = np.union1d(_decode_uint64(left["rows"]["hashes"]), _decode_uint64(right["rows"]["hashes"]))
+        if len(merged_hashes) <= row_hash_limit:
+            row_hashes = _encode_uint64(merged_hashes)
+
+    return {
+        "version": PROFILE_VERSION,
+        "rowCount": left["rowCount"] + right["rowCount"],
+        "memoryBytes": left["memoryBytes"] + right["memoryBytes"],
+        "columns": columns,
+        "rows": {
+            "hashes": row_hashes,
+            "distinct": row_hll.to_dict()
+        },
+        "preview": (left["preview"] + right["preview"])[:10]
+    }
+
+
+def report_profile(
+    profile: dict,
+    inspect_level: str,
+    percentiles: list[float],
+    seed: int | None = None
+) -> tuple[dict, list[dict], dict, list[dict]]:
+    """Derive summary, columns, quality and preview outputs from profile state."""
+    row_count = profile["rowCount"]
+    summary = {
+        "rowCount": row_count,
+        "columnCount": len(profile["columns"]),
+        "memoryUsage": _format_bytes(profile["memoryBytes"]),
+        "approximate": True
+    }
+
+    columns_info = []
+    for col in profile["columns"]:
+        hll = HyperLogLog.from_dict(col["distinct"])
+        unique_count = min(int(round(hll.estimate())), col["nonNullCount"])
+        null_percent = (col["nullCount"] / row_count * 100) if row_count > 0 else 0
+
+        col_info: dict[str, typing.Any] = {
+            "name": col["name"],
+            "type": col["type"],
+            "nullCount": col["nullCount"],
+            "uniqueCount": unique_count,
+            "nullPercent": round(null_percent, 2),
+            "sampleValues": col["sampleValues"],
+            "approximation": {
+                "uniqueCount": hll.error_bounds(unique_count)
+            }
+        }
+
+        numeric = col["numeric"]
+        if inspect_level in ["detailed", "quality"] and numeric is not None:
+            count = numeric["count"]
+            col_info["stats"] = {
+                "min": numeric["min"],
+                "max": numeric["max"],
+                "mean": numeric["sum"] / count if count else None,
+                "median": None,
+                "std": math.sqrt(numeric["m2"] / (count - 1)) if count > 1 else None
+            }
+            _add_quantile_stats(col_info, KLLSketch.from_dict(numeric["quantiles"], seed=seed), percentiles)
+
+        columns_info.append(col_info)
+
+    quality: dict[str, typing.Any] = {}
+    if inspect_level == "quality":
+        total_cells = row_count * len(profile["columns"])
+        non_null_cells = sum(col["nonNullCount"] for col in profile["columns"])
+        completeness = (non_null_cells / total_cells * 100) if total_cells > 0 else 100
+
+        row_hashes = profile["rows"]["hashes"]
+        if row_hashes is not None:
+            duplicate_rows = row_count - len(_decode_uint64(row_hashes))
+        else:
+            row_hll = HyperLogLog.from_dict(profile["rows"]["distinct"])
+            duplicate_rows = max(0, row_count - int(round(row_hll.estimate())))
+
+        quality = {
+            "completeness": round(completeness, 2),
+            "duplicateRows": duplicate_rows,
+            "issues": _quality_issues(completeness, duplicate_rows, columns_info)
+        }
+        if row_hashes is None:
+            quality["approximation"] = {
+                "distinctRows": row_hll.error_bounds(row_count - duplicate_rows)
+            }
+
+    return summary, columns_info, quality, profile["preview"]
+
+
+def _check_profile(profile: dict) -> None:
+    if not isinstance(profile, dict) or profile.get("version") != PROFILE_VERSION:
+        raise ValueError(f"Unsupported profile state, expected version {PROFILE_VERSION}")
+
+
+def _null_column_profile(name: str, row_count: int, like: dict) -> dict:
+    """Profile of an all-null column, sized to match another column's sketches."""
+    precision = like["distinct"]["precision"]
+    numeric = None
+    if like["numeric"] is not None:
+        numeric = {
+            "count": 0,
+            "sum": 0.0,
+            "m2": 0.0,
+            "min": None,
+            "max": None,
+            "quantiles": KLLSketch(like["numeric"]["quantiles"]["k"]).to_dict()
+        }
+    return {
+        "name": name,
+        "type": like["type"],
+        "nonNullCount": 0,
+        "nullCount": row_count,
+        "distinct": HyperLogLog(precision).to_dict(),
+        "numeric": numeric,
+        "sampleValues": []
+    }
+
+
+def _merge_column_profiles(left: dict, right: dict, seed: int | None = None) -> dict:
+    """Merge the state of one column from two chunks."""
+    # Chunks without values say nothing about the type
+    if left["nonNullCount"] == 0:
+        data_type = right["type"]
+    elif right["nonNullCount"] == 0 or left["type"] == right["type"]:
+        data_type = left["type"]
+    else:
+        data_type = "mixed"
+
+    hll = HyperLogLog.from_dict(left["distinct"])
+    hll.merge(HyperLogLog.from_dict(right["distinct"]))
+
+    numeric = None
+    left_numeric, right_numeric = left["numeric"], right["numeric"]
+    if data_type == "number":
+        numeric = left_numeric if right_numeric is None or right_numeric["count"] == 0 else right_numeric
+        if left_numeric is not None and right_numeric is not None and left_numeric["count"] and right_numeric["count"]:
+            numeric = _merge_numeric_profiles(left_numeric, right_numeric, seed)
+
+    return {
+        "name": left["name"],
+        "type": data_type,
+        "nonNullCount": left["nonNullCount"] + right["nonNullCount"],
+        "nullCount": left["nullCount"] + right["nullCount"],
+        "distinct": hll.to_dict(),
+        "numeric": numeric,
+        "sampleValues": (left["sampleValues"] + right["sampleValues"])[:5]
+    }
+
+
+def _merge_numeric_profiles(left: dict, right: dict, seed: int | None = None) -> dict:
+    """Merge moments, extremes and quantile sketches of two non-empty numeric columns."""
+    count = left["count"] + right["count"]
+    delta = right["sum"] / right["count"] - left["sum"] / left["count"]
+    kll = KLLSketch.from_dict(left["quantiles"], seed=seed)
+    kll.merge(KLLSketch.from_dict(right["quantiles"]))
+    return {
+        "count": count,
+        "sum": left["sum"] + right["sum"],
+        "m2": left["m2"] + right["m2"] + delta * delta * left["count"] * right["count"] / count,
+        "min": min(left["min"], right["min"]),
+        "max": max(left["max"], right["max"]),
+        "quantiles": kll.to_dict()
+    }
+
+
+def _encode_uint64(values: np.ndarray) -> str:
+    return base64.b64encode(values.astype("<u8").tobytes()).decode("ascii")
+
+
+def _decode_uint64(encoded: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(encoded), dtype="<u8").astype(np.uint64)
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """SplitMix64 finalizer, spreads bits of combined hashes."""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def _row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """Hash whole rows by column name and value; null and missing cells contribute nothing."""
+    combined = np.zeros(len(df), dtype=np.uint64)
+    for col in df.columns:
+        col_data = df[col]
+        mask = col_data.notna().to_numpy()
+        if not mask.any():
+            continue
+        name_hash = _hash_series(pd.Series([str(col)]))[0]
+        cell_hashes = np.zeros(len(df), dtype=np.uint64)
+        cell_hashes[mask] = _mix64(_hash_series(col_data) ^ name_hash)
+        # Addition is order independent, so column order does not matter across chunks
+        combined += cell_hashes
+    return combined
+
+
+def _percentile_label(q: float) -> str:
+    """Format a percentile fraction as a label, e.g. 0.25 -> 'p25'."""
+    return f"p{q * 100:g}"
+
+
+def _hash_series(series: pd.Series) -> np.ndarray:
+    """Hash non-null values to uint64 so equal values hash equally across batches."""
+    values = series.dropna()
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        # Normalize ints and -0.0 so 1, 1.0 and -0.0/0.0 are counted once, like nunique()
+        values = values.astype("float64") + 0.0
+    return pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+
+
+def _leading_zeros64(values: np.ndarray) -> np.ndarray:
+    """Count leading zero bits of each uint64 value."""
+    values = values.copy()
+    zeros = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = (values >> np.uint64(64 - shift)) == 0
+        zeros[mask] += shift
+        values[mask] <<= np.uint64(shift)
+    zeros[values == 0] += 1
+    return zeros
+
+
+class HyperLogLog:
+    """HyperLogLog distinct-count sketch with 2^precision registers."""
+
+    MIN_PRECISION = 4
+    MAX_PRECISION = 18
+
+    def __init__(self, precision: int = 14):
+        if not self.MIN_PRECISION <= precision <= self.MAX_PRECISION:
+            raise ValueError(
+                f"HyperLogLog precision must be between {self.MIN_PRECISION} and {self.MAX_PRECISION}, got {precision}"
+            )
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @classmethod
+    def for_error(cls, relative_error: float) -> "HyperLogLog":
+        """Create the smallest sketch whose standard error is at most relative_error."""
+        precision = math.ceil(math.log2((1.04 / relative_error) ** 2))
+        return cls(min(max(precision, cls.MIN_PRECISION), cls.MAX_PRECISION))
+
+    @property
+    def relative_error(self) -> float:
+        """Relative standard error of the estimate."""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def update_series(self, series: pd.Series) -> None:
+        """Add the non-null values of a column, one batch at a time."""
+        for start in range(0, len(series), SKETCH_BATCH_ROWS):
+            self.update_hashes(_hash_series(series.iloc[start:start + SKETCH_BATCH_ROWS]))
+
+    def update_hashes(self, hashes: np.ndarray) -> None:
+        """Add pre-hashed uint64 values."""
+        if len(hashes) == 0:
+            return
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.intp)
+        rank = np.minimum(_leading_zeros64(hashes << np.uint64(p)), 64 - p) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def to_dict(self) -> dict:
+        """Serialize registers to a JSON-compatible dict."""
+        return {
+            "precision": self.precision,
+            "registers": base64.b64encode(self.registers.tobytes()).decode("ascii")
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "HyperLogLog":
+        """Restore a sketch serialized with to_dict."""
+        hll = cls(state["precision"])
+        registers = np.frombuffer(base64.b64decode(state["registers"]), dtype=np.uint8)
+        if len(registers) != len(hll.registers):
+            raise ValueError("Corrupt HyperLogLog state: register count does not match precision")
+        hll.registers = registers.copy()
+        return hll
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """Merge another sketch of the same precision into this one."""
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge HyperLogLog sketches with precision {self.precision} and {other.precision}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> float:
+        """Estimated number of distinct values."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        zero_registers = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zero_registers > 0:
+            # Small-range correction (linear counting)
+            return m * math.log(m / zero_registers)
+        return raw
+
+    def error_bounds(self, estimate: int) -> dict:
+        """Describe the estimate with its ~95% confidence interval."""
+        margin = 2 * self.relative_error * estimate
+        return {
+            "method": "hyperloglog",
+            "precision": self.precision,
+            "relativeError": round(self.relative_error, 6),
+            "confidence": 0.95,
+            "lower": max(0, int(math.floor(estimate - margin))),
+            "upper": int(math.ceil(estimate + margin))
+        }
+
+
+class KLLSketch:
+    """KLL quantile sketch; items at level h stand for 2^h original values."""
+
+    MIN_K = 8
+    MAX_K = 65535
+
+    def __init__(self, k: int = 200, seed: int | None = None):
+        if not self.MIN_K <= k <= self.MAX_K:
+            raise ValueError(f"KLL parameter k must be between {self.MIN_K} and {self.MAX_K}, got {k}")
+        self.k = k
+        self.count = 0
+        self.levels: list[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def for_error(cls, rank_error: float, seed: int | None = None) -> "KLLSketch":
+        """Create the smallest sketch whose normalized rank error is at most rank_error."""
+        k = math.ceil((2.296 / rank_error) ** (1 / 0.9723))
+        return cls(min(max(k, cls.MIN_K), cls.MAX_K), seed=seed)
+
+    @property
+    def rank_error(self) -> float:
+        """Normalized rank error of a single quantile query (99% confidence)."""
+        return 2.296 / self.k ** 0.9723
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def update_series(self, series: pd.Series) -> None:
+        """Add the non-null numeric values of a column, one batch at a time."""
+        for start in range(0, len(series), SKETCH_BATCH_ROWS):
+            batch = series.iloc[start:start + SKETCH_BATCH_ROWS].dropna()
+            self.update(batch.to_numpy(dtype="float64"))
+
+    def update(self, values: np.ndarray) -> None:
+        """Add a batch of float values."""
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def to_dict(self) -> dict:
+        """Serialize retained items per level to a JSON-compatible dict."""
+        return {
+            "k": self.k,
+            "count": self.count,
+            "levels": [level.tolist() for level in self.levels]
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict, seed: int | None = None) -> "KLLSketch":
+        """Restore a sketch serialized with to_dict."""
+        kll = cls(state["k"], seed=seed)
+        kll.count = state["count"]
+        kll.levels = [np.asarray(level, dtype=np.float64) for level in state["levels"]] or [np.empty(0)]
+        return kll
+
+    def merge(self, other: "KLLSketch") -> None:
+        """Merge another sketch into this one."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # Keep one item back when odd, promote every other item with a random offset
+                paired = len(items) - len(items) % 2
+                promoted = items[self._rng.integers(2):paired:2]
+                self.levels[level] = items[paired:]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def quantiles(self, fractions: list[float]) -> list[float]:
+        """Approximate value at each quantile fraction."""
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2 ** h, dtype=np.float64) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        items = items[order]
+        cumulative = np.cumsum(weights[order])
+        targets = np.asarray(fractions, dtype=np.float64) * cumulative[-1]
+        positions = np.minimum(np.searchsorted(cumulative, targets, side="left"), len(items) - 1)
+        return [float(items[pos]) for pos in positions]
@@ -3,11 +3,18 @@ import typing
 class Inputs(typing.TypedDict):
     leftData: list[dict]
     rightData: list[dict]
-    joinType: typing.Literal["inner", "left", "right", "outer"] | None
+    joinType: typing.Literal["inner", "left", "right", "outer", "asof", "range", "semi", "anti", "fuzzy"] | None
     leftKey: typing.Any
     rightKey: typing.Any
     suffixes: list[str] | None
     dropDuplicates: bool | None
+    lookup: bool | None
+    spill: dict | None
+    asof: dict | None
+    range: dict | None
+    fuzzy: dict | None
+    dimensions: list[dict] | None
+    select: list[str] | None
 class Outputs(typing.TypedDict):
     data: typing.NotRequired[list[dict]]
     matchedRows: typing.NotRequired[int]
@@ -15,17 +22,73 @@ class Outputs(typing.TypedDict):
     rightUnmatched: typing.NotRequired[int]
     joinType: typing.NotRequired[str]
     keyColumns: typing.NotRequired[list[str]]
+    indexStats: typing.NotRequired[dict]
+    outputPath: typing.NotRequired[str]
+    spillStats: typing.NotRequired[dict]
+    starStats: typing.NotRequired[dict]
+    fuzzyStats: typing.NotRequired[dict]
 #endregion
 
 from oocana import Context
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+import numpy as np
+import hashlib
+import math
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+LOOKUP_CACHE_MAX_ENTRIES = 16
+SPILL_CHUNK_ROWS = 200000
+SPILL_MEMORY_BUDGET_MB = 512
+# A partition's merge needs a few times its input size (factorized keys, indexers, output)
+SPILL_MEMORY_FACTOR = 4
+# Hash of every null key, whatever dtype the chunk inferred for its key column
+SPILL_NULL_KEY_HASH = np.uint64(0x9E3779B97F4A7C15)
+# Fact rows probed against every dimension to estimate its fanout for join ordering
+STAR_SAMPLE_ROWS = 2000
+# Blocking keys shared by more right rows than this are too common to narrow anything down
+FUZZY_MAX_BLOCK_SIZE = 500
+# Strings are scored on their first 64 characters, one bit per character in the LCS bitmasks
+FUZZY_MAX_CHARS = 64
+FUZZY_SCORE_BATCH = 50000
+POPCOUNT_8 = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
 
 
 async def main(params: Inputs, context: Context) -> Outputs:
     """
     Join two tables based on key columns.
 
-    Supports inner, left, right, and outer joins similar to SQL JOIN operations.
+    Supports inner, left, right, and outer joins similar to SQL JOIN operations, plus
+    ordered joins: asof (nearest right row by an ordered column, optionally within
+    equal leftKey/rightKey groups) and range (right intervals containing or overlapping
+    the left value). Ordered joins sort once and binary-search, never cross-joining.
+    Semi and anti joins return the left rows that do (or do not) have a key partner on
+    the right, unchanged, by testing membership in the set of distinct right keys.
+    Fuzzy joins match similar text: n-gram, token or sorted-neighborhood blocking picks
+    candidate pairs, which are scored with Jaro-Winkler or token-set ratio.
+
+    With dimensions, leftData is a fact table joined to rightData and every listed
+    dimension in one pass: the most selective inner joins run first, rows are tracked
+    as positions into each table, and only the selected columns are gathered at the end.
+
+    With lookup enabled, rightData is treated as a dimension table: its key index is
+    built once, cached by content fingerprint, and later calls only probe it.
+
+    With spill enabled, both inputs are hash-partitioned by key into files under the
+    session directory, partition pairs are joined independently within a memory budget,
+    and the result is streamed to a file instead of being returned inline.
     """
 
     # Extract parameters
@@ -36,6 +99,13 @@ async def main(params: Inputs, context: Context) -> Outputs:
     right_key = params.get("rightKey")
     suffixes = params.get("suffixes") or ["_x", "_y"]
     drop_duplicates = params.get("dropDuplicates", False)
+    lookup = params.get("lookup") or False
+    spill = params.get("spill") or {}
+    asof = params.get("asof") or {}
+    fuzzy = params.get("fuzzy") or {}
+    range_options = params.get("range") or {}
+    dimensions = params.get("dimensions") or []
+    select = params.get("select")
 
     # Validate inputs
     if not left_data:
@@ -43,14 +113,122 @@ async def main(params: Inputs, context: Context) -> Outputs:
     if not right_data:
         raise ValueError("Right table data cannot be empty")
 
+    if join_type not in ["inner", "left", "right", "outer", "asof", "range", "semi", "anti", "fuzzy"]:
+        raise ValueError(f"Invalid join type: {join_type}. Must be one of: inner, left, right, outer, asof, range, semi, anti, fuzzy")
+    if join_type in ["asof", "range", "semi", "anti", "fuzzy"] and (lookup or spill.get("enabled")):
+        raise ValueError(f"The {join_type} join type cannot be combined with lookup or spill modes")
+
+    # Star join: rightData is the first dimension, the top-level keys and joinType its spec
+    if dimensions:
+        if join_type not in ["inner", "left"] or spill.get("enabled"):
+            raise ValueError(f"Star joins support inner and left join types without spill, got: {join_type}")
+        specs = [{
+            "name": "right", "data": right_data, "leftKey": left_key, "rightKey": right_key,
+            "joinType": join_type, "suffix": suffixes[1]
+        }] + dimensions
+        return star_join(left_data, specs, lookup, select, drop_duplicates)
+
+    # Membership joins never build merged rows
+    if join_type in ["semi", "anti"]:
+        return semi_join(left_data, right_data, join_type, left_key, right_key, drop_duplicates)
+
+    # Out-of-core join: partitions spill to disk and the result streams to a file
+    if spill.get("enabled"):
+        if lookup:
+            raise ValueError("Lookup and spill modes cannot be combined")
+        return spill_join(left_data, right_data, join_type, left_key, right_key, suffixes, drop_duplicates, spill, context.session_dir)
+
     # Convert to DataFrames
     left_df = pd.DataFrame(left_data)
-    right_df = pd.DataFrame(right_data)
+    if lookup:
+        dimension, index_stats = dimension_table(right_data)
+        right_df = dimension["frame"]
+    else:
+        right_df = pd.DataFrame(right_data)
 
+    if join_type in ["asof", "range", "fuzzy"] and left_key is None and right_key is None:
+        # Equality keys only partition ordered joins, so they are never auto-detected
+        left_keys, right_keys = [], []
+    else:
+        left_keys, right_keys = resolve_keys(left_df.columns, right_df.columns, left_key, right_key)
+
+    # Store original row counts for statistics
+    original_left_count = len(left_df)
+    original_right_count = len(right_df)
+
+    # Perform the join; ordered joins keep left rows like a left join unless told otherwise
+    how = join_type
+    if join_type == "asof":
+        how = "left"
+        merged_df, left_has_match, right_has_match = asof_join(left_df, right_df, left_keys, right_keys, asof, suffixes)
+    elif join_type == "range":
+        how = range_options.get("how") or "left"
+        if how not in ["inner", "left"]:
+            raise ValueError(f"Range joins support inner and left, got: {how}")
+        merged_df, left_has_match, right_has_match = range_join(
+            left_df, right_df, left_keys, right_keys, range_options, how, suffixes
+        )
+    elif join_type == "fuzzy":
+        how = fuzzy.get("how") or "inner"
+        if how not in ["inner", "left"]:
+            raise ValueError(f"Fuzzy joins support inner and left, got: {how}")
+        merged_df, left_has_match, right_has_match, fuzzy_stats = fuzzy_join(
+            left_df, right_df, left_keys, right_keys, fuzzy, how, suffixes
+        )
+    elif lookup:
+        if join_type not in ["inner", "left"]:
+            raise ValueError(f"Lookup joins support inner and left join types, got: {join_type}")
+        merged_df, left_has_match, right_has_match = lookup_join(
+            left_df, dimension, left_keys, right_keys, join_type, suffixes, index_stats
+        )
+    else:
+        merged_df = pd.merge(
+            left_df, right_df,
+            left_on=left_keys,
+            right_on=right_keys,
+            how=join_type,
+            suffixes=tuple(suffixes)
+        )
+        left_has_match, right_has_match = key_match_masks(left_df, right_df, left_keys, right_keys)
+
+    # Drop duplicates if requested
+    if drop_duplicates:
+        merged_df = merged_df.drop_duplicates()
+
+    # Calculate statistics
+    matched_rows = len(merged_df)
+
+    # Unmatched rows are those the join type drops: rows whose key has no partner on the other side
+    left_unmatched = int((~left_has_match).sum()) if how in ["inner", "right"] else 0
+    right_unmatched = int((~right_has_match).sum()) if how in ["inner", "left"] else 0
+
+    # Convert result to list of dicts
+    result_data = merged_df.to_dict(orient="records")
+
+    # Get all key columns (combine left and right keys)
+    all_key_columns = list(set(left_keys + right_keys))
+
+    result: Outputs = {
+        "data": result_data,
+        "matchedRows": matched_rows,
+        "leftUnmatched": left_unmatched,
+        "rightUnmatched": right_unmatched,
+        "joinType": join_type,
+        "keyColumns": all_key_columns
+    }
+    if lookup:
+        result["indexStats"] = index_stats
+    if join_type == "fuzzy":
+        result["fuzzyStats"] = fuzzy_stats
+    return result
+
+
+def resolve_keys(left_columns: pd.Index, right_columns: pd.Index, left_key: typing.Any, right_key: typing.Any) -> tuple[list[str], list[str]]:
+    """Resolve and validate the join key columns of both tables."""
     # Auto-detect join keys if not specified
     if left_key is None and right_key is None:
         # Use common columns as keys
-        common_cols = list(set(left_df.columns) & set(right_df.columns))
+        common_cols = list(set(left_columns) & set(right_columns))
         if not common_cols:
             raise ValueError("No common columns found between tables. Please specify leftKey or rightKey.")
         left_key = common_cols
@@ -71,114 +249,876 @@ async def main(params: Inputs, context: Context) -> Outputs:
 
     # Validate key columns exist
     for key in left_keys:
-        if key not in left_df.columns:
-            raise ValueError(f"Left key column '{key}' not found in left table. Available columns: {list(left_df.columns)}")
+        if key not in left_columns:
+            raise ValueError(f"Left key column '{key}' not found in left table. Available columns: {list(left_columns)}")
 
     for key in right_keys:
-        if key not in right_df.columns:
-            raise ValueError(f"Right key column '{key}' not found in right table. Available columns: {list(right_df.columns)}")
+        if key not in right_columns:
+            raise ValueError(f"Right key column '{key}' not found in right table. Available columns: {list(right_columns)}")
 
-    # Store original row counts for statistics
-    original_left_count = len(left_df)
-    original_right_count = len(right_df)
+    return left_keys, right_keys
 
-    # Perform the join
-    if join_type == "inner":
-        merged_df = pd.merge(
-            left_df, right_df,
-            left_on=left_keys,
-            right_on=right_keys,
-            how="inner",
-            suffixes=tuple(suffixes)
-        )
-    elif join_type == "left":
-        merged_df = pd.merge(
-            left_df, right_df,
-            left_on=left_keys,
-            right_on=right_keys,
-            how="left",
-            suffixes=tuple(suffixes)
-        )
-    elif join_type == "right":
-        merged_df = pd.merge(
-            left_df, right_df,
-            left_on=left_keys,
-            right_on=right_keys,
-            how="right",
-            suffixes=tuple(suffixes)
-        )
-    elif join_type == "outer":
-        merged_df = pd.merge(
-            left_df, right_df,
-            left_on=left_keys,
-            right_on=right_keys,
-            how="outer",
-            suffixes=tuple(suffixes)
-        )
+
+def key_match_masks(left_df: pd.DataFrame, right_df: pd.DataFrame, left_keys: list[str], right_keys: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Whether each left row has a key partner on the right and vice versa, from one shared factorization."""
+    left_codes, right_codes = shared_key_codes(left_df, right_df, left_keys, right_keys)
+    key_count = int(max(left_codes.max(initial=-1), right_codes.max(initial=-1))) + 1
+    left_has_match = (np.bincount(right_codes, minlength=key_count) > 0)[left_codes]
+    right_has_match = (np.bincount(left_codes, minlength=key_count) > 0)[right_codes]
+    return left_has_match, right_has_match
+
+
+def shared_key_codes(left_df: pd.DataFrame, right_df: pd.DataFrame, left_keys: list[str], right_keys: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Integer codes for the key tuples of both tables; equal keys (nulls included) share a code."""
+    left_count = len(left_df)
+    codes = np.zeros(left_count + len(right_df), dtype=np.int64)
+    for left_key, right_key in zip(left_keys, right_keys):
+        left_values = left_df[left_key].to_numpy()
+        right_values = right_df[right_key].to_numpy()
+        if left_values.dtype != right_values.dtype:
+            # Mixed dtypes meet as objects, so 1 and 1.0 still match and an empty side decides nothing
+            left_values = left_values.astype(object)
+            right_values = right_values.astype(object)
+        # Nulls get a code of their own, since merge matches null keys to each other
+        column_codes, uniques = pd.factorize(np.concatenate([left_values, right_values]), use_na_sentinel=False)
+        # Fold the next key column in and re-compact, so codes stay below the row count
+        codes, _ = pd.factorize(codes * len(uniques) + column_codes)
+    return codes[:left_count], codes[left_count:]
+
+
+class LRUCache:
+    """LRU cache with hit and miss counters, shared across calls in this process."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[typing.Any, typing.Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: typing.Any) -> typing.Any:
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: typing.Any, value: typing.Any) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / total, 4) if total else None
+        }
+
+
+LOOKUP_CACHE = LRUCache(LOOKUP_CACHE_MAX_ENTRIES)
+
+
+class DimensionIndex:
+    """Factorized key index of a dimension table: its unique keys and the rows behind each."""
+
+    def __init__(self, right_df: pd.DataFrame, right_keys: list[str]):
+        self.codes, self.uniques = pd.factorize(_key_index(right_df, right_keys), use_na_sentinel=False)
+        self.order = np.argsort(self.codes, kind="stable")
+        self.counts = np.bincount(self.codes, minlength=len(self.uniques))
+        self.starts = np.concatenate([[0], np.cumsum(self.counts)[:-1]])
+        # Build the unique keys' hash table now, so every later probe is lookups only
+        self.uniques.get_indexer(self.uniques[:1])
+
+    def probe(self, left_df: pd.DataFrame, left_keys: list[str]) -> np.ndarray:
+        """Code of every left row's key in this index, or -1 when absent."""
+        return self.uniques.get_indexer(_key_index(left_df, left_keys))
+
+    def expand(self, codes: np.ndarray, join_type: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Left and right row positions of the joined rows for probed codes, plus each left row's match count."""
+        found = codes >= 0
+        matches = np.where(found, self.counts[codes], 0)
+        # Every left row repeats once per matching right row (once with no partner, for left joins)
+        repeats = matches if join_type == "inner" else np.maximum(matches, 1)
+        left_positions = np.repeat(np.arange(len(codes)), repeats)
+        offsets = np.arange(len(left_positions)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        first_rows = np.repeat(np.where(found, self.starts[codes], 0), repeats)
+        right_positions = np.where(np.repeat(matches > 0, repeats), self.order[first_rows + offsets], -1)
+        return left_positions, right_positions, matches
+
+
+def dimension_table(right_data: list[dict]) -> tuple[dict, dict]:
+    """Cached frame and key indexes of a dimension table, keyed by a fingerprint of its content."""
+    started = time.perf_counter()
+    fingerprint = hashlib.blake2b(pickle.dumps(right_data, protocol=pickle.HIGHEST_PROTOCOL), digest_size=16).hexdigest()
+    index_stats = {"fingerprint": fingerprint, "fingerprintMs": round((time.perf_counter() - started) * 1000, 3)}
+
+    dimension = LOOKUP_CACHE.get(fingerprint)
+    index_stats["tableCacheHit"] = dimension is not None
+    if dimension is None:
+        dimension = {"frame": pd.DataFrame(right_data), "indexes": {}}
+        LOOKUP_CACHE.put(fingerprint, dimension)
+    return dimension, index_stats
+
+
+def lookup_join(left_df: pd.DataFrame, dimension: dict, left_keys: list[str], right_keys: list[str],
+                join_type: str, suffixes: list[str], index_stats: dict) -> tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """Probe the dimension's cached key index and assemble the same frame pd.merge would."""
+    right_df = dimension["frame"]
+    index = dimension_index(dimension, right_keys, index_stats)
+
+    started = time.perf_counter()
+    codes = index.probe(left_df, left_keys)
+    found = codes >= 0
+    probed = np.zeros(len(index.uniques), dtype=bool)
+    probed[codes[found]] = True
+    left_positions, right_positions, matches = index.expand(codes, join_type)
+    index_stats["probeMs"] = round((time.perf_counter() - started) * 1000, 3)
+    index_stats["cache"] = LOOKUP_CACHE.stats()
+
+    merged_df = assemble_join(left_df, right_df, left_positions, right_positions, left_keys, right_keys, suffixes)
+    return merged_df, matches > 0, probed[index.codes]
+
+
+def dimension_index(dimension: dict, right_keys: list[str], index_stats: dict) -> DimensionIndex:
+    """The dimension's key index on right_keys, built on first use and kept with the dimension."""
+    index = dimension["indexes"].get(tuple(right_keys))
+    index_stats["indexCacheHit"] = index is not None
+    if index is None:
+        started = time.perf_counter()
+        index = DimensionIndex(dimension["frame"], right_keys)
+        dimension["indexes"][tuple(right_keys)] = index
+        index_stats["buildMs"] = round((time.perf_counter() - started) * 1000, 3)
+    return index
+
+
+def assemble_join(left_df: pd.DataFrame, right_df: pd.DataFrame, left_positions: np.ndarray, right_positions: np.ndarray,
+                  left_keys: list[str], right_keys: list[str], suffixes: list[str]) -> pd.DataFrame:
+    """Pair up rows by position (-1 for no right partner) in the same layout pd.merge produces."""
+    # Same layout as merge: right keys named like their left key appear once, overlaps get suffixes
+    right_part = right_df.drop(columns=[rk for lk, rk in zip(left_keys, right_keys) if lk == rk])
+    left_out = left_df.iloc[left_positions].reset_index(drop=True)
+    if (right_positions < 0).any():
+        right_out = right_part.reindex(right_positions).reset_index(drop=True)
     else:
-        raise ValueError(f"Invalid join type: {join_type}. Must be one of: inner, left, right, outer")
+        right_out = right_part.iloc[right_positions].reset_index(drop=True)
 
-    # Drop duplicates if requested
+    overlap = set(left_out.columns) & set(right_out.columns)
+    left_out = left_out.rename(columns={col: f"{col}{suffixes[0]}" for col in overlap})
+    right_out = right_out.rename(columns={col: f"{col}{suffixes[1]}" for col in overlap})
+
+    return pd.concat([left_out, right_out], axis=1)
+
+
+def star_join(left_data: list[dict], specs: list[dict], lookup: bool, select: list[str] | None,
+              drop_duplicates: bool) -> Outputs:
+    """Join a fact table to several dimensions on fact-table keys, carrying only row positions between steps."""
+    fact_df = pd.DataFrame(left_data)
+    steps = []
+    for number, spec in enumerate(specs):
+        name = spec.get("name") or f"dimension{number}"
+        how = spec.get("joinType") or "inner"
+        if how not in ["inner", "left"]:
+            raise ValueError(f"Dimension '{name}' join type must be inner or left, got: {how}")
+        if not spec.get("data"):
+            raise ValueError(f"Dimension '{name}' data cannot be empty")
+        if lookup:
+            dimension, index_stats = dimension_table(spec["data"])
+        else:
+            dimension, index_stats = {"frame": pd.DataFrame(spec["data"]), "indexes": {}}, {}
+        left_keys, right_keys = resolve_keys(fact_df.columns, dimension["frame"].columns, spec.get("leftKey"), spec.get("rightKey"))
+        steps.append({
+            "name": name, "how": how, "suffix": spec.get("suffix") or f"_{name}",
+            "frame": dimension["frame"], "leftKeys": left_keys, "rightKeys": right_keys,
+            "index": dimension_index(dimension, right_keys, index_stats), "indexStats": index_stats
+        })
+
+    # Cost model: expected output rows per fact row, measured on an evenly spaced sample.
+    # Inner joins that filter the most go first so every later probe sees fewer rows;
+    # left joins never remove rows, so they go last.
+    sample = fact_df.iloc[np.unique(np.linspace(0, len(fact_df) - 1, min(len(fact_df), STAR_SAMPLE_ROWS)).astype(np.int64))]
+    for step in steps:
+        codes = step["index"].probe(sample, step["leftKeys"])
+        step["fanout"] = float(np.where(codes >= 0, step["index"].counts[codes], 0).mean())
+    order = sorted(range(len(steps)), key=lambda i: (steps[i]["how"] != "inner", steps[i]["fanout"]))
+
+    # Each dimension's (small) key index is probed by the surviving fact rows only
+    fact_positions = np.arange(len(fact_df))
+    right_positions: dict[int, np.ndarray] = {}
+    for i in order:
+        step = steps[i]
+        started = time.perf_counter()
+        codes = step["index"].probe(fact_df[step["leftKeys"]].iloc[fact_positions], step["leftKeys"])
+        rows, positions, _ = step["index"].expand(codes, step["how"])
+        fact_positions = fact_positions[rows]
+        right_positions = {done: done_positions[rows] for done, done_positions in right_positions.items()}
+        right_positions[i] = positions
+        step["rowsAfter"] = len(fact_positions)
+        step["probeMs"] = round((time.perf_counter() - started) * 1000, 3)
+
+    # Output columns in spec order; equal-named keys appear once, other clashes take the dimension suffix
+    sources = {column: (fact_df, None, column) for column in fact_df.columns}
+    for i, step in enumerate(steps):
+        shared = {rk for lk, rk in zip(step["leftKeys"], step["rightKeys"]) if lk == rk}
+        for column in step["frame"].columns:
+            if column not in shared:
+                output_name = f"{column}{step['suffix']}" if column in sources else column
+                sources[output_name] = (step["frame"], i, column)
+    columns = list(sources) if select is None else select
+    for column in columns:
+        if column not in sources:
+            raise ValueError(f"Selected column '{column}' not found in joined tables. Available columns: {list(sources)}")
+
+    merged_df = pd.DataFrame({
+        column: _gather(sources[column][0][sources[column][2]], fact_positions if sources[column][1] is None else right_positions[sources[column][1]])
+        for column in columns
+    }, columns=columns)
     if drop_duplicates:
         merged_df = merged_df.drop_duplicates()
 
-    # Calculate statistics
-    matched_rows = len(merged_df)
+    right_unmatched = 0
+    for i, step in enumerate(steps):
+        referenced = np.zeros(len(step["frame"]), dtype=bool)
+        referenced[right_positions[i][right_positions[i] >= 0]] = True
+        right_unmatched += int((~referenced).sum())
 
-    # For inner join, calculate unmatched rows
-    if join_type == "inner":
-        # Find rows from left that didn't match
-        left_matched = left_df.merge(
-            right_df[right_keys],
-            left_on=left_keys,
-            right_on=right_keys,
-            how="inner"
-        )
-        left_unmatched = original_left_count - len(left_matched.drop_duplicates(subset=left_keys))
-
-        # Find rows from right that didn't match
-        right_matched = right_df.merge(
-            left_df[left_keys],
-            left_on=right_keys,
-            right_on=left_keys,
-            how="inner"
+    return {
+        "data": merged_df.to_dict(orient="records"),
+        "matchedRows": len(merged_df),
+        "leftUnmatched": len(fact_df) - len(np.unique(fact_positions)),
+        "rightUnmatched": right_unmatched,
+        "joinType": "star",
+        "keyColumns": list(dict.fromkeys(key for step in steps for key in step["leftKeys"] + step["rightKeys"])),
+        "starStats": {
+            "order": [steps[i]["name"] for i in order],
+            "steps": [{
+                "name": steps[i]["name"],
+                "joinType": steps[i]["how"],
+                "estimatedFanout": round(steps[i]["fanout"], 4),
+                "rowsAfter": steps[i]["rowsAfter"],
+                "probeMs": steps[i]["probeMs"],
+                **steps[i]["indexStats"]
+            } for i in order]
+        }
+    }
+
+
+def _gather(column: pd.Series, positions: np.ndarray) -> np.ndarray:
+    """Values of a column at row positions, null where the position is -1."""
+    if len(positions) and positions.min() < 0:
+        return column.reindex(positions).to_numpy()
+    return column.to_numpy()[positions]
+
+
+def semi_join(left_data: list[dict], right_data: list[dict], join_type: str, left_key: typing.Any,
+              right_key: typing.Any, drop_duplicates: bool) -> Outputs:
+    """Keep the left rows whose key is (semi) or is not (anti) among the distinct right keys."""
+    # Only the key columns are materialized as frames
+    left_keys, right_keys = resolve_keys(_record_columns(left_data), _record_columns(right_data), left_key, right_key)
+
+    # Null keys match each other, as in merge
+    right_index = _key_index(pd.DataFrame.from_records(right_data, columns=right_keys), right_keys).unique()
+    left_has_match = _key_index(pd.DataFrame.from_records(left_data, columns=left_keys), left_keys).isin(right_index)
+    keep = left_has_match if join_type == "semi" else ~left_has_match
+
+    if drop_duplicates:
+        result_data = pd.DataFrame(left_data)[keep].drop_duplicates().to_dict(orient="records")
+    else:
+        result_data = [left_data[position] for position in np.flatnonzero(keep)]
+
+    return {
+        "data": result_data,
+        "matchedRows": len(result_data),
+        "leftUnmatched": int((~left_has_match).sum()),
+        "rightUnmatched": 0,
+        "joinType": join_type,
+        "keyColumns": list(set(left_keys + right_keys))
+    }
+
+
+def _record_columns(data: list[dict]) -> pd.Index:
+    """Column names across all records, in first-seen order."""
+    return pd.Index(list(dict.fromkeys(column for row in data for column in row)))
+
+
+def asof_join(left_df: pd.DataFrame, right_df: pd.DataFrame, by_left: list[str], by_right: list[str],
+              asof: dict, suffixes: list[str]) -> tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """Match every left row to the nearest right row on an ordered column, within equal by-key groups."""
+    left_on = asof.get("leftOn") or asof.get("on")
+    right_on = asof.get("rightOn") or asof.get("on") or left_on
+    direction = asof.get("direction") or "backward"
+    allow_exact = asof.get("allowExactMatches", True)
+    if not left_on:
+        raise ValueError("As-of joins need asof.on (or asof.leftOn) naming the ordered column")
+    if direction not in ["backward", "forward", "nearest"]:
+        raise ValueError(f"Invalid as-of direction: {direction}. Must be one of: backward, forward, nearest")
+    _check_columns(left_df, [left_on], "left")
+    _check_columns(right_df, [right_on], "right")
+
+    (left_points, right_points), (left_valid, right_valid), tolerance = _ordered_values(
+        [left_df[left_on], right_df[right_on]], asof.get("tolerance")
+    )
+    left_groups, right_groups = shared_key_codes(left_df, right_df, by_left, by_right)
+    left_ranks, right_ranks = _joint_ranks([left_points, right_points])
+
+    # Sort the right side once by (group, value); every lookup is then one binary search
+    right_rows = np.flatnonzero(right_valid)
+    right_rows = right_rows[np.lexsort((right_ranks[right_rows], right_groups[right_rows]))]
+    scale = len(left_ranks) + len(right_ranks) + 1
+    right_sorted = right_groups[right_rows] * scale + right_ranks[right_rows]
+    left_sorted = left_groups * scale + left_ranks
+    right_count = len(right_rows)
+
+    def candidate(side: str, step: int) -> tuple[np.ndarray, np.ndarray]:
+        found = np.searchsorted(right_sorted, left_sorted, side=side) + step
+        inside = (found >= 0) & (found < right_count)
+        found = right_rows[np.clip(found, 0, right_count - 1)]
+        return found, inside & (right_groups[found] == left_groups) & left_valid
+
+    if right_count == 0:
+        right_positions = np.full(len(left_df), -1)
+    elif direction == "backward":
+        right_positions, valid = candidate("right" if allow_exact else "left", -1)
+    elif direction == "forward":
+        right_positions, valid = candidate("left" if allow_exact else "right", 0)
+    else:
+        back, back_valid = candidate("right" if allow_exact else "left", -1)
+        ahead, ahead_valid = candidate("left" if allow_exact else "right", 0)
+        # Ties go to the earlier right row, as in pandas.merge_asof
+        closer = np.abs(right_points[ahead] - left_points) < np.abs(left_points - right_points[back])
+        use_ahead = ahead_valid & (~back_valid | closer)
+        right_positions, valid = np.where(use_ahead, ahead, back), ahead_valid | back_valid
+
+    if right_count:
+        if tolerance is not None:
+            valid &= np.abs(left_points - right_points[right_positions]) <= tolerance
+        right_positions = np.where(valid, right_positions, -1)
+
+    matched = right_positions >= 0
+    right_has_match = np.zeros(len(right_df), dtype=bool)
+    right_has_match[right_positions[matched]] = True
+    # merge_asof keeps a single ordered column when both sides share its name
+    merged_df = assemble_join(
+        left_df, right_df, np.arange(len(left_df)), right_positions,
+        by_left + [left_on], by_right + [right_on], suffixes
+    )
+    return merged_df, matched, right_has_match
+
+
+def range_join(left_df: pd.DataFrame, right_df: pd.DataFrame, by_left: list[str], by_right: list[str],
+               range_options: dict, how: str, suffixes: list[str]) -> tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """Match left values (or intervals) to every right interval containing (or overlapping) them."""
+    left_start = range_options.get("leftOn") or range_options.get("leftStart")
+    left_end = range_options.get("leftOn") or range_options.get("leftEnd") or left_start
+    right_start = range_options.get("rightStart")
+    right_end = range_options.get("rightEnd")
+    closed = range_options.get("closed") or "both"
+    if not left_start or not right_start or not right_end:
+        raise ValueError("Range joins need range.leftOn (or leftStart/leftEnd), range.rightStart and range.rightEnd")
+    if closed not in ["both", "left", "right", "neither"]:
+        raise ValueError(f"Invalid range closed side: {closed}. Must be one of: both, left, right, neither")
+    _check_columns(left_df, [left_start, left_end], "left")
+    _check_columns(right_df, [right_start, right_end], "right")
+
+    values, valid, _ = _ordered_values(
+        [left_df[left_start], left_df[left_end], right_df[right_start], right_df[right_end]], None
+    )
+    left_valid, right_valid = valid[0] & valid[1], valid[2] & valid[3]
+    query_start_ranks, query_end_ranks, start_ranks, end_ranks = _joint_ranks(values)
+    left_groups, right_groups = shared_key_codes(left_df, right_df, by_left, by_right)
+
+    # Sort intervals by (group, start) and carry the running maximum end within each group:
+    # intervals before the first position whose running end reaches the query start cannot match
+    right_rows = np.flatnonzero(right_valid)
+    right_rows = right_rows[np.lexsort((start_ranks[right_rows], right_groups[right_rows]))]
+    groups = right_groups[right_rows]
+    reach = pd.Series(end_ranks[right_rows]).groupby(groups).cummax().to_numpy()
+    scale = len(query_start_ranks) * 2 + len(start_ranks) * 2 + 1
+    start_sorted = groups * scale + start_ranks[right_rows]
+    reach_sorted = groups * scale + reach
+
+    include_start = closed in ["both", "left"]
+    include_end = closed in ["both", "right"]
+    upper = np.searchsorted(start_sorted, left_groups * scale + query_end_ranks, side="right" if include_start else "left")
+    lower = np.searchsorted(reach_sorted, left_groups * scale + query_start_ranks, side="left" if include_end else "right")
+    candidates = np.where(left_valid, np.maximum(upper - lower, 0), 0)
+
+    # Expand the candidate windows and keep the intervals whose own end reaches the query
+    left_positions = np.repeat(np.arange(len(left_df)), candidates)
+    offsets = np.arange(len(left_positions)) - np.repeat(np.cumsum(candidates) - candidates, candidates)
+    right_positions = right_rows[np.repeat(lower, candidates) + offsets] if len(right_rows) else offsets
+    query_ranks = query_start_ranks[left_positions]
+    keep = end_ranks[right_positions] >= query_ranks if include_end else end_ranks[right_positions] > query_ranks
+    left_positions, right_positions = left_positions[keep], right_positions[keep]
+
+    left_has_match = np.bincount(left_positions, minlength=len(left_df)) > 0
+    right_has_match = np.bincount(right_positions, minlength=len(right_df)) > 0
+    if how == "left":
+        left_positions, pairs = _with_unmatched_left(left_positions, left_has_match)
+        right_positions = np.where(pairs >= 0, right_positions[pairs], -1)
+
+    merged_df = assemble_join(left_df, right_df, left_positions, right_positions, by_left, by_right, suffixes)
+    return merged_df, left_has_match, right_has_match
+
+
+def fuzzy_join(left_df: pd.DataFrame, right_df: pd.DataFrame, by_left: list[str], by_right: list[str],
+               fuzzy: dict, how: str, suffixes: list[str]) -> tuple[pd.DataFrame, np.ndarray, np.ndarray, dict]:
+    """Match left text to similar right text, scoring only the candidate pairs that blocking proposes."""
+    left_on = fuzzy.get("leftOn") or fuzzy.get("on")
+    right_on = fuzzy.get("rightOn") or fuzzy.get("on") or left_on
+    blocking = fuzzy.get("blocking") or "ngram"
+    scorer = fuzzy.get("scorer") or "jaroWinkler"
+    threshold = fuzzy.get("threshold", 0.85)
+    top_k = fuzzy.get("topK") or 1
+    score_column = fuzzy.get("scoreColumn") or "matchScore"
+    if not left_on:
+        raise ValueError("Fuzzy joins need fuzzy.on (or fuzzy.leftOn) naming the text column")
+    if blocking not in ["ngram", "token", "sortedNeighborhood"]:
+        raise ValueError(f"Invalid fuzzy blocking: {blocking}. Must be one of: ngram, token, sortedNeighborhood")
+    if scorer not in ["jaroWinkler", "tokenSet"]:
+        raise ValueError(f"Invalid fuzzy scorer: {scorer}. Must be one of: jaroWinkler, tokenSet")
+    _check_columns(left_df, [left_on], "left")
+    _check_columns(right_df, [right_on], "right")
+
+    left_text = _normalize_text(left_df[left_on])
+    right_text = _normalize_text(right_df[right_on])
+
+    started = time.perf_counter()
+    if blocking == "sortedNeighborhood":
+        left_ids, right_ids = _neighborhood_pairs(left_text, right_text, fuzzy.get("window") or 10)
+        skipped_blocks = 0
+    else:
+        left_ids, right_ids, skipped_blocks = _blocked_pairs(
+            left_text, right_text, blocking, fuzzy.get("ngram") or 3,
+            fuzzy.get("minShared") or 1, fuzzy.get("maxBlockSize") or FUZZY_MAX_BLOCK_SIZE
         )
-        right_unmatched = original_right_count - len(right_matched.drop_duplicates(subset=right_keys))
-
-    elif join_type == "left":
-        # All left rows are included
-        left_unmatched = 0
-        # Right unmatched: rows from right not in result
-        right_matched_keys = merged_df[right_keys].drop_duplicates()
-        right_unmatched = original_right_count - len(
-            right_df.merge(right_matched_keys, on=right_keys, how="inner")
+    candidate_pairs = len(left_ids)
+    # Exact leftKey/rightKey columns further restrict candidates to the same group
+    if by_left:
+        left_groups, right_groups = shared_key_codes(left_df, right_df, by_left, by_right)
+        same_group = left_groups[left_ids] == right_groups[right_ids]
+        left_ids, right_ids = left_ids[same_group], right_ids[same_group]
+    block_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    score = jaro_winkler if scorer == "jaroWinkler" else token_set_ratio
+    scores = np.concatenate([
+        score(left_text[left_ids[start:start + FUZZY_SCORE_BATCH]], right_text[right_ids[start:start + FUZZY_SCORE_BATCH]])
+        for start in range(0, len(left_ids), FUZZY_SCORE_BATCH)
+    ]) if len(left_ids) else np.zeros(0)
+    score_ms = (time.perf_counter() - started) * 1000
+    scored_pairs = len(scores)
+
+    # Best topK pairs per left row above the threshold, ties broken by right row order
+    passing = scores >= threshold
+    left_ids, right_ids, scores = left_ids[passing], right_ids[passing], scores[passing]
+    order = np.lexsort((right_ids, -scores, left_ids))
+    left_ids, right_ids, scores = left_ids[order], right_ids[order], scores[order]
+    rank = np.arange(len(left_ids)) - np.searchsorted(left_ids, left_ids, side="left")
+    left_ids, right_ids, scores = left_ids[rank < top_k], right_ids[rank < top_k], scores[rank < top_k]
+
+    left_has_match = np.bincount(left_ids, minlength=len(left_df)) > 0
+    right_has_match = np.bincount(right_ids, minlength=len(right_df)) > 0
+    if how == "left":
+        left_ids, pairs = _with_unmatched_left(left_ids, left_has_match)
+        right_ids = np.where(pairs >= 0, right_ids[pairs], -1)
+        scores = np.where(pairs >= 0, scores[pairs], np.nan)
+
+    merged_df = assemble_join(left_df, right_df, left_ids, right_ids, by_left, by_right, suffixes)
+    merged_df[score_column] = np.round(scores, 6)
+    fuzzy_stats = {
+        "blocking": blocking,
+        "scorer": scorer,
+        "fullPairs": len(left_df) * len(right_df),
+        "candidatePairs": candidate_pairs,
+        "scoredPairs": scored_pairs,
+        "matchedPairs": int(np.isfinite(scores).sum()),
+        "reductionRatio": round(1 - candidate_pairs / (len(left_df) * len(right_df)), 6),
+        "skippedBlocks": skipped_blocks,
+        "blockMs": round(block_ms, 3),
+        "scoreMs": round(score_ms, 3)
+    }
+    return merged_df, left_has_match, right_has_match, fuzzy_stats
+
+
+def _normalize_text(column: pd.Series) -> np.ndarray:
+    """Lowercased words without punctuation, single-spaced; nulls become empty strings."""
+    text = column.astype("string").str.lower().str.replace(r"[^\w\s]+", " ", regex=True).str.split().str.join(" ")
+    return text.fillna("").to_numpy(dtype=object)
+
+
+def _blocked_pairs(left_text: np.ndarray, right_text: np.ndarray, blocking: str, ngram: int,
+                   min_shared: int, max_block_size: int) -> tuple[np.ndarray, np.ndarray, int]:
+    """Candidate pairs sharing at least min_shared blocking keys, via an inverted index over the right keys."""
+    def block_keys(texts: np.ndarray) -> tuple[np.ndarray, list[str]]:
+        if blocking == "token":
+            keys = [set(text.split()) for text in texts]
+        else:
+            keys = [{padded[i:i + ngram] for i in range(len(padded) - ngram + 1)} for padded in (f" {text} " for text in texts)]
+        # Empty text (nulls) has no keys, so it is never a candidate
+        keys = [row_keys if text else set() for row_keys, text in zip(keys, texts)]
+        rows = np.repeat(np.arange(len(texts)), [len(row_keys) for row_keys in keys])
+        return rows, [key for row_keys in keys for key in row_keys]
+
+    left_rows, left_keys = block_keys(left_text)
+    right_rows, right_keys = block_keys(right_text)
+    codes, uniques = pd.factorize(np.array(left_keys + right_keys, dtype=object))
+    left_codes, right_codes = codes[:len(left_keys)], codes[len(left_keys):]
+
+    # Inverted index: right rows grouped by key code; oversized blocks are skipped
+    counts = np.bincount(right_codes, minlength=len(uniques))
+    oversized = counts > max_block_size
+    counts[oversized] = 0
+    order = np.argsort(right_codes, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(np.bincount(right_codes, minlength=len(uniques)))[:-1]])
+
+    repeats = counts[left_codes]
+    pair_left = np.repeat(left_rows, repeats)
+    offsets = np.arange(len(pair_left)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    pair_right = right_rows[order[np.repeat(starts[left_codes], repeats) + offsets]]
+
+    # Count the keys each pair shares from one sort of the combined pair ids
+    pair_ids, shared = np.unique(pair_left.astype(np.int64) * len(right_text) + pair_right, return_counts=True)
+    pair_ids = pair_ids[shared >= min_shared]
+    return pair_ids // len(right_text), pair_ids % len(right_text), int(oversized.sum())
+
+
+def _neighborhood_pairs(left_text: np.ndarray, right_text: np.ndarray, window: int) -> tuple[np.ndarray, np.ndarray]:
+    """Left-right pairs within window positions of each other when both sides are sorted together."""
+    texts = np.concatenate([left_text, right_text])
+    rows = np.concatenate([np.arange(len(left_text)), np.arange(len(right_text))])
+    is_left = np.concatenate([np.ones(len(left_text), dtype=bool), np.zeros(len(right_text), dtype=bool)])
+    keep = texts != ""
+    texts, rows, is_left = texts[keep], rows[keep], is_left[keep]
+    order = np.argsort(texts, kind="stable")
+    rows, is_left = rows[order], is_left[order]
+
+    left_ids, right_ids = [], []
+    for offset in range(1, window):
+        first, second = slice(None, -offset), slice(offset, None)
+        left_first = is_left[first] & ~is_left[second]
+        right_first = ~is_left[first] & is_left[second]
+        left_ids += [rows[first][left_first], rows[second][right_first]]
+        right_ids += [rows[second][left_first], rows[first][right_first]]
+    if not left_ids:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    pair_ids = np.unique(np.concatenate(left_ids).astype(np.int64) * len(right_text) + np.concatenate(right_ids))
+    return pair_ids // len(right_text), pair_ids % len(right_text)
+
+
+def _char_codes(left_texts: np.ndarray, right_texts: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Unicode code points of both sides as zero-padded arrays of one shared width, plus string lengths."""
+    width = max(1, min(FUZZY_MAX_CHARS, max((len(text) for text in np.concatenate([left_texts, right_texts])), default=1)))
+    encoded = []
+    for texts in (left_texts, right_texts):
+        fixed = np.array(texts, dtype=f"<U{width}")
+        encoded += [fixed.view(np.uint32).reshape(len(fixed), width).astype(np.int64), np.char.str_len(fixed)]
+    return tuple(encoded)
+
+
+def jaro_winkler(left_texts: np.ndarray, right_texts: np.ndarray) -> np.ndarray:
+    """Jaro-Winkler similarity of each string pair, vectorized across pairs."""
+    a, a_len, b, b_len = _char_codes(left_texts, right_texts)
+    pairs, width = a.shape
+    window = np.maximum(np.maximum(a_len, b_len) // 2 - 1, 0)
+    positions = np.arange(width)
+    b_valid = positions < b_len[:, None]
+
+    # Greedy Jaro matching: each character takes the first free equal character within the window
+    a_matched = np.zeros((pairs, width), dtype=bool)
+    b_matched = np.zeros((pairs, width), dtype=bool)
+    for i in range(int(a_len.max(initial=0))):
+        near = (np.abs(positions - i) <= window[:, None]) & b_valid & ~b_matched
+        candidates = near & (b == a[:, i:i + 1]) & (i < a_len)[:, None]
+        found = candidates.any(axis=1)
+        first = candidates.argmax(axis=1)
+        b_matched[found, first[found]] = True
+        a_matched[found, i] = True
+
+    matches = a_matched.sum(axis=1)
+    # Matched characters in order on each side; half the out-of-order ones are transpositions
+    a_order = np.take_along_axis(a, np.argsort(~a_matched, axis=1, kind="stable"), axis=1)
+    b_order = np.take_along_axis(b, np.argsort(~b_matched, axis=1, kind="stable"), axis=1)
+    transpositions = ((a_order != b_order) & (positions < matches[:, None])).sum(axis=1) // 2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        jaro = np.where(
+            matches > 0,
+            (matches / np.maximum(a_len, 1) + matches / np.maximum(b_len, 1) + (matches - transpositions) / np.maximum(matches, 1)) / 3,
+            0.0
         )
+    prefix = np.cumprod((a[:, :4] == b[:, :4]) & (positions[:4] < np.minimum(a_len, b_len)[:, None]), axis=1).sum(axis=1)
+    return np.where(jaro > 0.7, jaro + prefix * 0.1 * (1 - jaro), jaro)
+
+
+def token_set_ratio(left_texts: np.ndarray, right_texts: np.ndarray) -> np.ndarray:
+    """Token-set ratio of each pair: the best indel similarity among the shared tokens and each side's rest."""
+    shared, left_rest, right_rest = [], [], []
+    for left_text, right_text in zip(left_texts, right_texts):
+        left_tokens, right_tokens = set(left_text.split()), set(right_text.split())
+        common = " ".join(sorted(left_tokens & right_tokens))
+        shared.append(common)
+        left_rest.append(f"{common} {' '.join(sorted(left_tokens - right_tokens))}".strip())
+        right_rest.append(f"{common} {' '.join(sorted(right_tokens - left_tokens))}".strip())
+    shared, left_rest, right_rest = (np.array(texts, dtype=object) for texts in (shared, left_rest, right_rest))
+
+    ratio = np.maximum.reduce([
+        _indel_ratio(shared, left_rest), _indel_ratio(shared, right_rest), _indel_ratio(left_rest, right_rest)
+    ])
+    # One token set inside the other is a full match
+    subset = (shared != "") & ((shared == left_rest) | (shared == right_rest))
+    return np.where(subset, 1.0, ratio)
+
+
+def _indel_ratio(left_texts: np.ndarray, right_texts: np.ndarray) -> np.ndarray:
+    """2 * LCS / total length per pair, with the LCS from the bit-parallel algorithm across all pairs at once."""
+    a, a_len, b, b_len = _char_codes(left_texts, right_texts)
+    bits = np.left_shift(np.uint64(1), np.arange(a.shape[1], dtype=np.uint64))
+    a_valid = np.arange(a.shape[1]) < a_len[:, None]
+
+    rows = np.full(len(a), np.iinfo(np.uint64).max, dtype=np.uint64)
+    for j in range(int(b_len.max(initial=0))):
+        # Bitmask of the positions in a holding b's j-th character
+        mask = np.where((a == b[:, j:j + 1]) & a_valid, bits, np.uint64(0)).sum(axis=1, dtype=np.uint64)
+        carried = rows & mask
+        rows = np.where(j < b_len, (rows + carried) | (rows - carried), rows)
+
+    kept = np.where(a_valid, bits, np.uint64(0)).sum(axis=1, dtype=np.uint64)
+    lcs = POPCOUNT_8[(~rows & kept).view(np.uint8).reshape(len(a), 8)].sum(axis=1)
+    total = a_len + b_len
+    return np.where(total > 0, 2 * lcs / np.maximum(total, 1), 0.0)
+
+
+def _with_unmatched_left(left_positions: np.ndarray, left_has_match: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Left positions with unmatched left rows inserted in place, and each row's source pair (-1 for inserted rows)."""
+    unmatched = np.flatnonzero(~left_has_match)
+    order = np.argsort(np.concatenate([left_positions, unmatched]), kind="stable")
+    pairs = np.concatenate([np.arange(len(left_positions)), np.full(len(unmatched), -1)])[order]
+    return np.concatenate([left_positions, unmatched])[order], pairs
+
+
+def _check_columns(df: pd.DataFrame, columns: list[str], side: str) -> None:
+    for column in columns:
+        if column not in df.columns:
+            raise ValueError(f"Column '{column}' not found in {side} table. Available columns: {list(df.columns)}")
+
+
+def _ordered_values(columns: list[pd.Series], tolerance: typing.Any) -> tuple[list[np.ndarray], list[np.ndarray], typing.Any]:
+    """Comparable arrays for ordered columns with their non-null masks; dates become int64 epoch nanoseconds."""
+    if all(pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column) for column in columns):
+        values = [column.to_numpy(dtype="float64", na_value=np.nan) for column in columns]
+        valid = [~np.isnan(column_values) for column_values in values]
+        return [np.nan_to_num(v) for v in values], valid, None if tolerance is None else float(tolerance)
+
+    try:
+        parsed = [pd.to_datetime(column, format="mixed") for column in columns]
+        parsed = [column.dt.tz_convert(None) if column.dt.tz is not None else column for column in parsed]
+        tolerance = None if tolerance is None else pd.Timedelta(tolerance).value
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Ordered join columns must be all numeric or all dates: {e}")
+    # Nanoseconds stay exact in int64, where float64 would round them
+    valid = [column.notna().to_numpy() for column in parsed]
+    values = [column.fillna(pd.Timestamp(0)).to_numpy(dtype="datetime64[ns]").astype(np.int64) for column in parsed]
+    return values, valid, tolerance
+
+
+def _joint_ranks(arrays: list[np.ndarray]) -> list[np.ndarray]:
+    """Dense ranks over the union of all values, so group and value fold into one exact int64 sort key."""
+    _, ranks = np.unique(np.concatenate(arrays), return_inverse=True)
+    ranks = ranks.astype(np.int64)
+    return np.split(ranks, np.cumsum([len(array) for array in arrays])[:-1])
 
-    elif join_type == "right":
-        # All right rows are included
-        right_unmatched = 0
-        # Left unmatched: rows from left not in result
-        left_matched_keys = merged_df[left_keys].drop_duplicates()
-        left_unmatched = original_left_count - len(
-            left_df.merge(left_matched_keys, on=left_keys, how="inner")
+
+def _key_index(df: pd.DataFrame, keys: list[str]) -> pd.Index:
+    """Key columns as an Index (one key) or MultiIndex (several)."""
+    if len(keys) == 1:
+        return pd.Index(df[keys[0]])
+    return pd.MultiIndex.from_frame(df[keys])
+
+
+def spill_join(left_data: list[dict], right_data: list[dict], join_type: str, left_key: typing.Any, right_key: typing.Any,
+               suffixes: list[str], drop_duplicates: bool, spill: dict, session_dir: str) -> Outputs:
+    """Grace hash join: partition both inputs to disk by key, then join partition pairs one at a time."""
+    chunk_rows = spill.get("chunkRows") or SPILL_CHUNK_ROWS
+    workers = max(1, spill.get("workers") or 1)
+    budget = (spill.get("memoryBudgetMb") or SPILL_MEMORY_BUDGET_MB) * 1024 * 1024
+    output_format = spill.get("outputFormat") or ("parquet" if pyarrow is not None else "csv")
+    if output_format not in ["csv", "parquet"]:
+        raise ValueError(f"Invalid spill output format: {output_format}. Must be one of: csv, parquet")
+
+    # Keys are resolved against the first chunk of each side
+    left_head = pd.DataFrame(left_data[:chunk_rows])
+    right_head = pd.DataFrame(right_data[:chunk_rows])
+    left_keys, right_keys = resolve_keys(left_head.columns, right_head.columns, left_key, right_key)
+
+    # Enough partitions that every concurrently joined pair fits the memory budget
+    partitions = spill.get("partitions")
+    if not partitions:
+        estimate = (
+            left_head.memory_usage(deep=True).sum() / len(left_head) * len(left_data)
+            + right_head.memory_usage(deep=True).sum() / len(right_head) * len(right_data)
         )
+        partitions = max(1, math.ceil(estimate * SPILL_MEMORY_FACTOR * workers / budget))
+    del left_head, right_head
 
-    else:  # outer join
-        # All rows from both tables are included
-        left_unmatched = 0
-        right_unmatched = 0
+    spill_dir = tempfile.mkdtemp(prefix="join-spill-", dir=session_dir)
+    try:
+        started = time.perf_counter()
+        left_columns, left_bytes = _spill_partitions(left_data, left_keys, chunk_rows, partitions, os.path.join(spill_dir, "left"))
+        right_columns, right_bytes = _spill_partitions(right_data, right_keys, chunk_rows, partitions, os.path.join(spill_dir, "right"))
+        spill_ms = (time.perf_counter() - started) * 1000
 
-    # Convert result to list of dicts
-    result_data = merged_df.to_dict(orient="records")
+        def join_partition(partition: int) -> dict:
+            left_df = _read_partition(os.path.join(spill_dir, f"left-{partition}.pkl"), left_columns)
+            right_df = _read_partition(os.path.join(spill_dir, f"right-{partition}.pkl"), right_columns)
+            merged_df = pd.merge(left_df, right_df, left_on=left_keys, right_on=right_keys, how=join_type, suffixes=tuple(suffixes))
+            # Equal rows share their keys, hence their partition, so per-partition dedup is global
+            if drop_duplicates:
+                merged_df = merged_df.drop_duplicates()
+            left_has_match, right_has_match = key_match_masks(left_df, right_df, left_keys, right_keys)
+            part_path = os.path.join(spill_dir, f"part-{partition:05d}.{output_format}")
+            if output_format == "csv":
+                merged_df.to_csv(part_path, index=False, header=False)
+            else:
+                merged_df.to_parquet(part_path, index=False)
+            return {
+                "rows": len(merged_df),
+                "columns": list(merged_df.columns),
+                "leftUnmatched": int((~left_has_match).sum()),
+                "rightUnmatched": int((~right_has_match).sum()),
+                "path": part_path
+            }
 
-    # Get all key columns (combine left and right keys)
-    all_key_columns = list(set(left_keys + right_keys))
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(join_partition, range(partitions)))
+        join_ms = (time.perf_counter() - started) * 1000
+
+        output_path = _collect_parts(parts, output_format, session_dir)
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
 
     return {
-        "data": result_data,
-        "matchedRows": matched_rows,
-        "leftUnmatched": left_unmatched,
-        "rightUnmatched": right_unmatched,
+        "matchedRows": sum(part["rows"] for part in parts),
+        "leftUnmatched": sum(part["leftUnmatched"] for part in parts) if join_type in ["inner", "right"] else 0,
+        "rightUnmatched": sum(part["rightUnmatched"] for part in parts) if join_type in ["inner", "left"] else 0,
         "joinType": join_type,
-        "keyColumns": all_key_columns
+        "keyColumns": list(set(left_keys + right_keys)),
+        "outputPath": output_path,
+        "spillStats": {
+            "partitions": partitions,
+            "workers": workers,
+            "spilledBytes": left_bytes + right_bytes,
+            "largestPartitionRows": max(part["rows"] for part in parts),
+            "spillMs": round(spill_ms, 3),
+            "joinMs": round(join_ms, 3)
+        }
     }
+
+
+def _spill_partitions(data: list[dict], keys: list[str], chunk_rows: int, partitions: int, prefix: str) -> tuple[list[str], int]:
+    """Append each chunk's rows to the pickle file of their key partition; returns all columns seen."""
+    columns: dict[str, None] = {}
+    for partition in range(partitions):
+        open(f"{prefix}-{partition}.pkl", "wb").close()
+    for start in range(0, len(data), chunk_rows):
+        chunk = pd.DataFrame(data[start:start + chunk_rows])
+        columns.update(dict.fromkeys(chunk.columns))
+        for key in keys:
+            if key not in chunk.columns:
+                chunk[key] = np.nan
+        targets = _partition_of(chunk, keys, partitions)
+        # One file open at a time, so any partition count stays within the open-file limit
+        for partition, piece in chunk.groupby(targets, sort=False):
+            with open(f"{prefix}-{partition}.pkl", "ab") as handle:
+                pickle.dump(piece, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    return list(columns), sum(os.path.getsize(f"{prefix}-{partition}.pkl") for partition in range(partitions))
+
+
+def _partition_of(chunk: pd.DataFrame, keys: list[str], partitions: int) -> np.ndarray:
+    """Partition of every row; keys that merge would match (1 and 1.0, None and NaN) land together."""
+    hashes = np.zeros(len(chunk), dtype=np.uint64)
+    for key in keys:
+        values = chunk[key]
+        # Each chunk infers its own dtype (an all-null chunk is object), so nulls and plain
+        # numbers hash the same way whichever dtype the chunk happened to get
+        nulls = values.isna().to_numpy()
+        numeric = (
+            pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values)
+            or values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) in ["integer", "floating", "mixed-integer-float"]
+        )
+        if numeric:
+            # + 0.0 folds -0.0 into 0.0
+            key_hashes = pd.util.hash_array(values.to_numpy(dtype="float64", na_value=np.nan) + 0.0)
+        else:
+            key_hashes = pd.util.hash_array(values.to_numpy())
+        key_hashes[nulls] = SPILL_NULL_KEY_HASH
+        hashes = hashes * np.uint64(1000003) + key_hashes
+    return (hashes % np.uint64(partitions)).astype(np.int64)
+
+
+def _read_partition(path: str, columns: list[str]) -> pd.DataFrame:
+    """Concatenate the chunks spilled to one partition file, aligned to the table's columns."""
+    pieces = []
+    with open(path, "rb") as handle:
+        while True:
+            try:
+                pieces.append(pickle.load(handle))
+            except EOFError:
+                break
+    if not pieces:
+        return pd.DataFrame(columns=columns)
+
+    # A chunk whose column was all null inferred object; give it the type the other chunks agree on
+    dtypes = {}
+    for piece in pieces:
+        for column in piece.columns:
+            if column not in dtypes and piece[column].notna().any():
+                dtypes[column] = piece[column].dtype
+    for piece in pieces:
+        for column in piece.columns:
+            dtype = dtypes.get(column)
+            if dtype is None or piece[column].dtype == dtype or piece[column].notna().any():
+                continue
+            if pd.api.types.is_integer_dtype(dtype):
+                piece[column] = piece[column].astype("float64")
+            elif pd.api.types.is_float_dtype(dtype) or pd.api.types.is_datetime64_any_dtype(dtype):
+                piece[column] = piece[column].astype(dtype)
+    return pd.concat(pieces, ignore_index=True).reindex(columns=columns)
+
+
+def _collect_parts(parts: list[dict], output_format: str, session_dir: str) -> str:
+    """Move the per-partition results into the session directory as one CSV file or one Parquet dataset."""
+    output_dir = os.path.join(session_dir, "joins")
+    os.makedirs(output_dir, exist_ok=True)
+    stem = f"join-{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(3).hex()}"
+
+    if output_format == "csv":
+        output_path = os.path.join(output_dir, f"{stem}.csv")
+        with open(output_path, "w", encoding="utf-8", newline="") as output:
+            output.write(pd.DataFrame(columns=parts[0]["columns"]).to_csv(index=False))
+            for part in parts:
+                with open(part["path"], "r", encoding="utf-8", newline="") as source:
+                    shutil.copyfileobj(source, output)
+        return output_path
+
+    # Parts infer their own types (an unmatched side is all null in one partition, float in another),
+    # so every part is cast to one schema for the dataset to read back as a whole
+    written = [part for part in parts if part["rows"]] or parts[:1]
+    schemas = [pyarrow.parquet.read_schema(part["path"]).remove_metadata() for part in written]
+    shared_schema = pyarrow.unify_schemas(schemas, promote_options="permissive")
+
+    output_path = os.path.join(output_dir, stem)
+    os.makedirs(output_path)
+    for part, schema in zip(written, schemas):
+        target = os.path.join(output_path, os.path.basename(part["path"]))
+        if schema.equals(shared_schema):
+            shutil.move(part["path"], target)
+        else:
+            table = pyarrow.parquet.read_table(part["path"]).select(shared_schema.names).cast(shared_schema)
+            pyarrow.parquet.write_table(table, target)
+    return output_path
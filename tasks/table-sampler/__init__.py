@@ -1,8 +1,9 @@
 #region generated meta
 import typing
 class Inputs(typing.TypedDict):
-    data: list[dict]
-    method: typing.Literal["random", "stratified", "systematic", "head", "tail"]
+    data: list[dict] | None
+    file_path: str | None
+    method: typing.Literal["random", "stratified", "systematic", "head", "tail", "pps", "cluster"]
     size: float
     params: dict | None
 class Outputs(typing.TypedDict):
@@ -11,11 +12,18 @@ class Outputs(typing.TypedDict):
     sampleSize: typing.NotRequired[int]
     originalSize: typing.NotRequired[int]
     method: typing.NotRequired[str]
+    inclusionProbabilities: typing.NotRequired[list[float]]
+    handle: typing.NotRequired[dict]
 #endregion
 
 from oocana import Context
 import pandas as pd
 import numpy as np
+import os
+import chardet
+
+
+STREAM_CHUNK_ROWS = 100000
 
 
 async def main(params: Inputs, context: Context) -> Outputs:
@@ -28,22 +36,42 @@ async def main(params: Inputs, context: Context) -> Outputs:
     - systematic: Systematic sampling (every nth row)
     - head: Take first N rows
     - tail: Take last N rows
+    - pps: Probability proportional to size of a weight column
+    - cluster: Whole groups sharing a cluster key (size counts clusters)
+
+    When file_path is given instead of data, the file is read in chunks and
+    sampled in a single pass with memory bounded by the sample size.
     """
 
     # Extract parameters
-    data = params["data"]
+    data = params.get("data")
+    file_path = params.get("file_path")
     method = params["method"]
     size = params["size"]
     sampling_params = params.get("params") or {}
 
-    if not data:
-        raise ValueError("Data cannot be empty")
+    if data and file_path:
+        raise ValueError("Provide either data or file_path, not both")
 
     if size <= 0:
         raise ValueError("Sample size must be greater than 0")
 
-    df = pd.DataFrame(data)
-    original_size = len(df)
+    if file_path:
+        return stream_sample(file_path, method, size, sampling_params)
+
+    if not data:
+        raise ValueError("Data cannot be empty")
+
+    output_mode = sampling_params.get("output") or "records"
+    if output_mode not in ["records", "indices", "handle"]:
+        raise ValueError(f"Invalid output mode: {output_mode}. Must be one of: records, indices, handle")
+
+    # Without records only the columns the design reads are materialized
+    if output_mode == "records":
+        df = pd.DataFrame(data)
+    else:
+        df = _design_frame(data, _design_columns(method, sampling_params))
+    original_size = len(data)
 
     # Calculate actual sample size
     if 0 < size < 1:
@@ -53,21 +81,32 @@ async def main(params: Inputs, context: Context) -> Outputs:
         # Treat as count
         actual_size = int(size)
 
-    if actual_size > original_size:
-        raise ValueError(f"Sample size {actual_size} cannot exceed data size {original_size}")
-
     # Get sampling parameters
     seed = sampling_params.get("seed")
     replacement = sampling_params.get("replacement", False)
+    weight_column = sampling_params.get("weightColumn")
+
+    # Cluster sizes count clusters; weighted draws with replacement may exceed the row count
+    if method != "cluster" and actual_size > original_size and not (replacement and method == "pps"):
+        raise ValueError(f"Sample size {actual_size} cannot exceed data size {original_size}")
 
     # Set random seed for reproducibility
     if seed is not None:
         np.random.seed(seed)
 
+    # Inclusion probability of every sampled row, where the design defines one
+    probabilities = None
+    # Contiguous or strided designs are also described as a start/stop/step window
+    window = None
+
     # Perform sampling based on method
     if method == "random":
-        sampled_df = df.sample(n=actual_size, replace=replacement, random_state=seed)
-        indices = sampled_df.index.tolist()
+        weights = _sampling_weights(df, weight_column) if weight_column else None
+        # Same draw as DataFrame.sample(random_state=seed), without needing the frame
+        state = np.random.RandomState(seed) if seed is not None else np.random
+        indices = state.choice(original_size, size=actual_size, replace=replacement, p=None if weights is None else (weights / weights.sum()).to_numpy())
+        if weights is None:
+            probabilities = [_inclusion_probability(1 / original_size, actual_size, replacement)] * len(indices)
 
     elif method == "stratified":
         stratify_column = sampling_params.get("stratifyColumn")
@@ -77,27 +116,25 @@ async def main(params: Inputs, context: Context) -> Outputs:
         if stratify_column not in df.columns:
             raise ValueError(f"Stratify column '{stratify_column}' not found. Available: {list(df.columns)}")
 
-        # Calculate sample size for each stratum
-        strata_sizes = df[stratify_column].value_counts()
-        strata_proportions = strata_sizes / original_size
+        indices, probabilities = stratified_sample(df, stratify_column, actual_size, replacement, sampling_params, seed)
 
-        sampled_indices = []
-        for stratum, proportion in strata_proportions.items():
-            stratum_df = df[df[stratify_column] == stratum]
-            stratum_size = max(1, int(actual_size * proportion))  # At least 1 from each stratum
+    elif method == "pps":
+        if not weight_column:
+            raise ValueError("PPS sampling requires 'weightColumn' parameter")
 
-            # Ensure we don't exceed stratum size
-            stratum_size = min(stratum_size, len(stratum_df))
+        weights = _sampling_weights(df, weight_column).to_numpy(dtype=float)
+        indices, probabilities = pps_sample(weights, actual_size, replacement, np.random.default_rng(seed))
 
-            stratum_sample = stratum_df.sample(n=stratum_size, replace=replacement, random_state=seed)
-            sampled_indices.extend(stratum_sample.index.tolist())
+    elif method == "cluster":
+        cluster_column = sampling_params.get("clusterColumn")
+        if not cluster_column:
+            raise ValueError("Cluster sampling requires 'clusterColumn' parameter")
 
-        # Trim to exact size if needed
-        if len(sampled_indices) > actual_size:
-            sampled_indices = sampled_indices[:actual_size]
+        if cluster_column not in df.columns:
+            raise ValueError(f"Cluster column '{cluster_column}' not found. Available: {list(df.columns)}")
 
-        sampled_df = df.loc[sampled_indices]
-        indices = sampled_indices
+        weights = _sampling_weights(df, weight_column).to_numpy(dtype=float) if weight_column else None
+        indices, probabilities = cluster_sample(df[cluster_column], size, replacement, weights, np.random.default_rng(seed))
 
     elif method == "systematic":
         # Systematic sampling: select every k-th element
@@ -107,29 +144,496 @@ async def main(params: Inputs, context: Context) -> Outputs:
 
         # Start from a random position if seed is provided
         start = np.random.randint(0, step) if seed is not None else 0
-        indices = list(range(start, original_size, step))[:actual_size]
-        sampled_df = df.iloc[indices]
+        window = (start, min(original_size, start + step * actual_size), step)
 
     elif method == "head":
         # Take first N rows
-        sampled_df = df.head(actual_size)
-        indices = list(range(actual_size))
+        window = (0, actual_size, 1)
 
     elif method == "tail":
         # Take last N rows
-        sampled_df = df.tail(actual_size)
-        indices = list(range(original_size - actual_size, original_size))
+        window = (original_size - actual_size, original_size, 1)
+
+    else:
+        raise ValueError(f"Invalid sampling method: {method}. Must be one of: random, stratified, systematic, head, tail, pps, cluster")
+
+    return _sample_outputs(df, indices if window is None else None, window, probabilities, output_mode, original_size, method)
+
+
+def _sample_outputs(df: pd.DataFrame | None, indices, window: tuple[int, int, int] | None, probabilities: list[float] | None,
+                    output_mode: str, original_size: int, method: str) -> Outputs:
+    """Assemble outputs, building record dicts only in records mode."""
+    result: Outputs = {"originalSize": original_size, "method": method}
+
+    if window is not None and output_mode == "handle":
+        start, stop, step = window
+        result["handle"] = {"start": start, "stop": stop, "step": step}
+        result["sampleSize"] = len(range(start, stop, step))
+    else:
+        if window is not None:
+            indices = range(*window)
+        indices = indices.tolist() if isinstance(indices, np.ndarray) else list(indices)
+        if output_mode == "records":
+            # Convert to list of dicts; df is labelled by original row position
+            result["sample"] = df.loc[indices].to_dict(orient="records")
+        result["indices"] = indices
+        result["sampleSize"] = len(indices)
+
+    if probabilities is not None:
+        result["inclusionProbabilities"] = probabilities
+    return result
+
+
+def _design_columns(method: str, sampling_params: dict) -> list[str]:
+    """Columns a sampling design reads, beyond the row count."""
+    names = {
+        "random": ["weightColumn"],
+        "stratified": ["stratifyColumn", "neymanColumn"],
+        "pps": ["weightColumn"],
+        "cluster": ["clusterColumn", "weightColumn"],
+    }.get(method, [])
+    return list(dict.fromkeys(sampling_params[name] for name in names if sampling_params.get(name)))
+
+
+def _design_frame(data: list[dict], columns: list[str]) -> pd.DataFrame:
+    """Narrow frame holding only the given columns of the records."""
+    df = pd.DataFrame(data, columns=columns)
+    for column in columns:
+        # pandas fills absent keys with NaN, so tell missing columns from all-null ones
+        if df[column].isna().all() and not any(column in row for row in data):
+            raise ValueError(f"Column '{column}' not found. Available: {list(pd.DataFrame(data).columns)}")
+    return df
+
+
+def stream_sample(file_path: str, method: str, size: float, sampling_params: dict) -> Outputs:
+    """Sample a CSV/TSV/Excel file chunk by chunk without loading it whole."""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    if size < 1:
+        raise ValueError("Sampling from a file requires a row count; proportions need the total row count up front")
+
+    if method == "systematic":
+        raise ValueError("Systematic sampling needs the total row count; read the file with table-reader first")
+
+    if method in ["pps", "cluster"]:
+        raise ValueError(f"{method} sampling needs the whole table; use random sampling with 'weightColumn' for a weighted file sample")
+
+    if method not in ["random", "stratified", "head", "tail"]:
+        raise ValueError(f"Invalid sampling method: {method}. Must be one of: random, stratified, systematic, head, tail, pps, cluster")
+
+    if sampling_params.get("replacement", False):
+        raise ValueError("Sampling with replacement is not supported when sampling from a file")
+
+    sample_size = int(size)
+    seed = sampling_params.get("seed")
+    weight_column = sampling_params.get("weightColumn")
+    stratify_column = sampling_params.get("stratifyColumn")
+    if method == "stratified" and not stratify_column:
+        raise ValueError("Stratified sampling requires 'stratifyColumn' parameter")
+
+    output_mode = sampling_params.get("output") or "records"
+    if output_mode not in ["records", "indices", "handle"]:
+        raise ValueError(f"Invalid output mode: {output_mode}. Must be one of: records, indices, handle")
+
+    rng = np.random.default_rng(seed)
+    reservoir = Reservoir(sample_size, stratify_column if method == "stratified" else None, sampling_params)
+    kept: list[pd.DataFrame] = []
+    kept_rows = 0
+    row_count = 0
+
+    for chunk in _read_chunks(file_path, sampling_params):
+        positions = np.arange(row_count, row_count + len(chunk), dtype=np.int64)
+        row_count += len(chunk)
+        chunk = chunk.reset_index(drop=True)
+
+        # Positions alone describe head and tail when no records are wanted
+        if method in ["head", "tail"] and output_mode != "records":
+            continue
+
+        if method == "head":
+            if kept_rows < sample_size:
+                kept.append(chunk.iloc[:sample_size - kept_rows].set_index(pd.Index(positions[:sample_size - kept_rows])))
+                kept_rows += len(kept[-1])
+            continue
+
+        if method == "tail":
+            kept.append(chunk.set_index(pd.Index(positions)))
+            kept_rows += len(chunk)
+            # Drop whole chunks that can no longer reach the last N rows
+            while kept_rows - len(kept[0]) >= sample_size:
+                kept_rows -= len(kept.pop(0))
+            continue
+
+        for column in [weight_column, reservoir.stratify_column, reservoir.neyman_column]:
+            if column and column not in chunk.columns:
+                raise ValueError(f"Column '{column}' not found. Available: {list(chunk.columns)}")
+        if output_mode != "records":
+            chunk = chunk[_design_columns(method, sampling_params)]
+
+        # Exponential(1) / w keys: keeping the smallest is A-Res weighted reservoir sampling
+        keys = rng.exponential(size=len(chunk))
+        if weight_column:
+            weights = _sampling_weights(chunk, weight_column).to_numpy()
+            positive = weights > 0
+            keys = keys[positive] / weights[positive]
+            chunk = chunk[positive].reset_index(drop=True)
+            positions = positions[positive]
+        reservoir.offer(chunk, keys, positions)
+
+    if sample_size > row_count:
+        raise ValueError(f"Sample size {sample_size} cannot exceed data size {row_count}")
+
+    if method in ["head", "tail"] and output_mode != "records":
+        window = (0, sample_size, 1) if method == "head" else (row_count - sample_size, row_count, 1)
+        return _sample_outputs(None, None, window, None, output_mode, row_count, method)
+
+    if method in ["head", "tail"]:
+        sampled_df = pd.concat(kept) if kept else pd.DataFrame()
+        if method == "tail":
+            sampled_df = sampled_df.iloc[len(sampled_df) - sample_size:]
+        indices = sampled_df.index.tolist()
+    else:
+        sampled_df, indices = reservoir.result()
+        sampled_df.index = indices
+        if method == "random" and len(indices) < sample_size:
+            raise ValueError(f"Only {len(indices)} rows have a positive weight in '{weight_column}'; cannot sample {sample_size}")
+
+    return _sample_outputs(sampled_df, indices, None, None, output_mode, row_count, method)
+
+
+class Reservoir:
+    """Keeps the rows with the smallest random keys seen so far, overall or per stratum."""
+
+    def __init__(self, capacity: int, stratify_column: str | None = None, sampling_params: dict | None = None):
+        self.capacity = capacity
+        self.stratify_column = stratify_column
+        self.sampling_params = sampling_params or {}
+        self.neyman_column = self.sampling_params.get("neymanColumn") if stratify_column else None
+        self.rows: pd.DataFrame | None = None
+        self.keys = np.empty(0)
+        self.positions = np.empty(0, dtype=np.int64)
+        self.counts: pd.Series = pd.Series(dtype=np.int64)
+        self.moments = pd.DataFrame(columns=["n", "sum", "sumsq"], dtype=float)
+
+    def offer(self, chunk: pd.DataFrame, keys: np.ndarray, positions: np.ndarray) -> None:
+        """Merge a chunk into the reservoir, evicting rows whose keys no longer qualify."""
+        if self.stratify_column:
+            strata = _strata(chunk[self.stratify_column])
+            self.counts = self.counts.add(strata.value_counts(dropna=False), fill_value=0).astype(np.int64)
+            if self.neyman_column:
+                values = pd.to_numeric(chunk[self.neyman_column], errors="coerce")
+                moments = pd.DataFrame({"n": values.notna(), "sum": values.fillna(0), "sumsq": values.fillna(0) ** 2})
+                self.moments = self.moments.add(moments.groupby(strata.to_numpy(), dropna=False).sum(), fill_value=0)
+            candidates = keys < strata.map(self._thresholds()).fillna(np.inf).to_numpy()
+        elif len(self.keys) >= self.capacity:
+            candidates = keys < self.keys.max()
+        else:
+            candidates = np.ones(len(keys), dtype=bool)
+
+        # Only rows that beat the current threshold are copied at all
+        if not candidates.any():
+            return
+        chunk = chunk[candidates]
+        rows = chunk if self.rows is None else pd.concat([self.rows, chunk], ignore_index=True)
+        keys = np.concatenate([self.keys, keys[candidates]])
+        positions = np.concatenate([self.positions, positions[candidates]])
+
+        if self.stratify_column:
+            ranks = pd.Series(keys).groupby(_strata(rows[self.stratify_column]).to_numpy(), dropna=False).rank(method="first")
+            keep = np.flatnonzero(ranks.to_numpy() <= self.capacity)
+        elif len(keys) > self.capacity:
+            keep = np.argpartition(keys, self.capacity - 1)[:self.capacity]
+        else:
+            keep = np.arange(len(keys))
+
+        self.rows = rows.iloc[keep].reset_index(drop=True)
+        self.keys = keys[keep]
+        self.positions = positions[keep]
+
+    def _thresholds(self) -> pd.Series:
+        """Largest kept key of every stratum whose reservoir is full."""
+        if self.rows is None:
+            return pd.Series(dtype=float)
+        grouped = pd.Series(self.keys).groupby(_strata(self.rows[self.stratify_column]).to_numpy())
+        full = grouped.size() >= self.capacity
+        return grouped.max()[full]
+
+    def result(self) -> tuple[pd.DataFrame, list[int]]:
+        """Final sample in file order; strata share the capacity per the allocation rule."""
+        if self.rows is None:
+            return pd.DataFrame(), []
+
+        if self.stratify_column:
+            spread = None
+            if self.neyman_column:
+                moments = self.moments.reindex(self.counts.index, fill_value=0)
+                variance = (moments["sumsq"] - moments["sum"] ** 2 / moments["n"]) / (moments["n"] - 1)
+                spread = np.sqrt(variance.clip(lower=0).fillna(0).to_numpy())
+            quota = allocate_strata(self.counts.to_numpy(), self.capacity, self.sampling_params, spread)
+            allocation = pd.Series(quota, index=self.counts.index)
+            ranks = pd.Series(self.keys).groupby(_strata(self.rows[self.stratify_column]).to_numpy(), dropna=False).rank(method="first")
+            strata = _strata(self.rows[self.stratify_column])
+            quota = strata.map(allocation).fillna(0).to_numpy()
+            keep = np.flatnonzero(ranks.to_numpy() <= quota)
+        else:
+            keep = np.arange(len(self.keys))
+
+        keep = keep[np.argsort(self.positions[keep], kind="stable")]
+        return self.rows.iloc[keep].reset_index(drop=True), self.positions[keep].tolist()
+
+
+def _strata(values: pd.Series) -> pd.Series:
+    """Stratum labels with None and NaN folded into a single missing stratum."""
+    return values.where(values.notna(), np.nan)
+
+
+def stratified_sample(df: pd.DataFrame, stratify_column: str, total: int, replacement: bool, sampling_params: dict, seed: int | None) -> tuple[list[int], list[float]]:
+    """Sample every stratum in one vectorized pass; returns row positions and inclusion probabilities."""
+    codes, _ = pd.factorize(_strata(df[stratify_column]), use_na_sentinel=False)
+    counts = np.bincount(codes)
+
+    spread = None
+    neyman_column = sampling_params.get("neymanColumn")
+    if neyman_column:
+        if neyman_column not in df.columns:
+            raise ValueError(f"Neyman column '{neyman_column}' not found. Available: {list(df.columns)}")
+        values = pd.to_numeric(df[neyman_column], errors="coerce")
+        spread = values.groupby(codes).std().reindex(range(len(counts))).fillna(0).to_numpy()
+
+    quota = allocate_strata(counts, total, sampling_params, spread, replacement)
+    rng = np.random.default_rng(seed)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    probabilities = _inclusion_probability(1 / counts, quota, replacement)
+
+    if replacement:
+        order = np.argsort(codes, kind="stable")
+        slots = np.repeat(np.arange(len(counts)), quota)
+        offsets = (rng.random(len(slots)) * counts[slots]).astype(np.int64)
+        picks = np.sort(order[starts[slots] + offsets])
+    else:
+        # Random keys sorted within each stratum; the first quota rows of every stratum win
+        order = np.lexsort((rng.random(len(codes)), codes))
+        ranks = np.arange(len(codes)) - starts[codes[order]]
+        picks = np.sort(order[ranks < quota[codes[order]]])
+    return picks.tolist(), probabilities[codes[picks]].tolist()
+
+
+def pps_sample(weights: np.ndarray, size: int, replacement: bool, rng: np.random.Generator) -> tuple[list[int], list[float]]:
+    """Probability-proportional-to-size sample; returns positions and inclusion probabilities."""
+    if not (weights > 0).any():
+        raise ValueError("PPS sampling requires at least one positive weight")
+
+    if replacement:
+        picks = AliasTable(weights).draw(size, rng)
+        probabilities = _inclusion_probability(weights / weights.sum(), size, True)
+        return picks.tolist(), probabilities[picks].tolist()
+
+    positive = int((weights > 0).sum())
+    if size > positive:
+        raise ValueError(f"Only {positive} rows have a positive weight; cannot sample {size} without replacement")
+
+    probabilities = pps_inclusion(weights, size)
+    picks = _systematic_pps(probabilities, rng)
+    return picks.tolist(), probabilities[picks].tolist()
+
+
+def cluster_sample(clusters: pd.Series, size: float, replacement: bool, weights: np.ndarray | None, rng: np.random.Generator) -> tuple[list[int], list[float]]:
+    """Sample whole clusters, uniformly or PPS by their total weight; every row carries its cluster's probability."""
+    codes, _ = pd.factorize(_strata(clusters), use_na_sentinel=False)
+    counts = np.bincount(codes)
+    cluster_count = len(counts)
+    clusters_wanted = int(cluster_count * size) if size < 1 else int(size)
+
+    if clusters_wanted > cluster_count and not replacement:
+        raise ValueError(f"Sample size {clusters_wanted} cannot exceed cluster count {cluster_count}")
+
+    if weights is not None:
+        drawn, probabilities = pps_sample(np.bincount(codes, weights=weights, minlength=cluster_count), clusters_wanted, replacement, rng)
+        drawn = np.asarray(drawn, dtype=np.int64)
+        probabilities = np.asarray(probabilities)
+    else:
+        if replacement:
+            drawn = rng.integers(0, cluster_count, clusters_wanted)
+        else:
+            drawn = np.sort(rng.choice(cluster_count, clusters_wanted, replace=False))
+        probabilities = np.full(len(drawn), _inclusion_probability(1 / cluster_count, clusters_wanted, replacement))
+
+    # Expand every drawn cluster into its rows via the cluster-sorted row order
+    order = np.argsort(codes, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    lengths = counts[drawn]
+    ends = np.cumsum(lengths)
+    offsets = np.arange(ends[-1] if len(ends) else 0) - np.repeat(ends - lengths, lengths)
+    picks = order[np.repeat(starts[drawn], lengths) + offsets]
+    row_probabilities = np.repeat(probabilities, lengths)
+
+    if not replacement:
+        row_order = np.argsort(picks, kind="stable")
+        picks, row_probabilities = picks[row_order], row_probabilities[row_order]
+    return picks.tolist(), row_probabilities.tolist()
+
+
+def pps_inclusion(weights: np.ndarray, size: int) -> np.ndarray:
+    """First-order inclusion probabilities n*w/W, with units reaching 1 taken with certainty."""
+    probabilities = np.zeros(len(weights))
+    certain = np.zeros(len(weights), dtype=bool)
+    while True:
+        rest = ~certain & (weights > 0)
+        remaining = size - int(certain.sum())
+        probabilities[rest] = remaining * weights[rest] / weights[rest].sum() if remaining > 0 else 0.0
+        newly_certain = rest & (probabilities >= 1)
+        if not newly_certain.any():
+            break
+        certain |= newly_certain
+    probabilities[certain] = 1.0
+    return probabilities
+
+
+def _systematic_pps(probabilities: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Randomized systematic PPS: exact inclusion probabilities in O(n)."""
+    certain = np.flatnonzero(probabilities >= 1)
+    rest = rng.permutation(np.flatnonzero((probabilities > 0) & (probabilities < 1)))
+    remaining = int(round(probabilities[rest].sum()))
+    cumulative = np.cumsum(probabilities[rest])
+    points = rng.random() + np.arange(remaining)
+    chosen = rest[np.minimum(np.searchsorted(cumulative, points, side="right"), len(rest) - 1)] if remaining else rest[:0]
+    return np.sort(np.concatenate([certain, chosen]))
+
+
+def _inclusion_probability(selection: float | np.ndarray, draws: int | np.ndarray, replacement: bool) -> float | np.ndarray:
+    """Chance a unit with per-draw probability selection appears in the sample."""
+    if replacement:
+        return 1 - (1 - selection) ** draws
+    return selection * draws
+
+
+class AliasTable:
+    """Walker/Vose alias table: O(n) to build, O(1) per weighted draw."""
+
+    def __init__(self, weights: np.ndarray):
+        n = len(weights)
+        self.prob = weights * n / weights.sum()
+        self.alias = np.arange(n)
+        small = np.flatnonzero(self.prob < 1)
+        large = np.flatnonzero(self.prob >= 1)
+
+        # Vectorized Vose: each round hands consecutive small columns to the large
+        # column whose cumulative excess covers their cumulative deficit
+        while len(small) and len(large):
+            deficit = np.cumsum(1 - self.prob[small])
+            excess = np.cumsum(self.prob[large] - 1)
+            owner = np.searchsorted(excess, deficit, side="left")
+            done = owner < len(large)
+            if not done.any():
+                done[0], owner[0] = True, len(large) - 1
+            filled, donors = small[done], large[owner[done]]
+            self.alias[filled] = donors
+            np.subtract.at(self.prob, donors, 1 - self.prob[filled])
+            drained = self.prob[large] < 1
+            small = np.concatenate([small[~done], large[drained]])
+            large = large[~drained]
+
+        # Columns left over by rounding are full
+        self.prob[small] = 1.0
+        self.prob[large] = 1.0
+
+    def draw(self, size: int, rng: np.random.Generator) -> np.ndarray:
+        """Draw size positions with replacement."""
+        columns = rng.integers(0, len(self.prob), size)
+        return np.where(rng.random(size) < self.prob[columns], columns, self.alias[columns])
+
+
+def allocate_strata(counts: np.ndarray, total: int, sampling_params: dict, spread: np.ndarray | None = None, replacement: bool = False) -> np.ndarray:
+    """Per-stratum sample sizes that add up to exactly total (or every row, if fewer)."""
+    allocation = sampling_params.get("allocation") or "proportional"
+    if allocation == "proportional":
+        weights = counts.astype(float)
+    elif allocation == "equal":
+        weights = np.ones(len(counts))
+    elif allocation == "neyman":
+        if spread is None:
+            raise ValueError("Neyman allocation requires 'neymanColumn' parameter")
+        weights = counts * spread
+    else:
+        raise ValueError(f"Invalid allocation: {allocation}. Must be one of: proportional, equal, neyman")
+
+    capacity = np.full(len(counts), np.inf) if replacement else counts.astype(float)
+    total = int(min(total, capacity.sum()))
+
+    # Guaranteed minimum first, dropped entirely when the strata outnumber the sample
+    quota = np.minimum(sampling_params.get("minPerStratum", 1), capacity)
+    if quota.sum() > total:
+        quota = np.zeros(len(counts))
+    budget = total - int(quota.sum())
+    room = capacity - quota
+
+    # Share the rest by weight, capping strata that run out of rows and re-sharing the excess
+    exact = np.zeros(len(counts))
+    capped = np.zeros(len(counts), dtype=bool)
+    while budget > 0:
+        free = ~capped & (room > 0)
+        shares = np.where(free, weights, 0.0)
+        if shares.sum() <= 0:
+            shares = free.astype(float)
+        exact = np.where(capped, room, shares * (budget - room[capped].sum()) / shares.sum())
+        over = free & (exact > room)
+        if not over.any():
+            break
+        capped |= over
+
+    # Largest remainder rounding; ties go to the earlier stratum
+    whole = np.floor(exact)
+    leftover = int(round(budget - whole.sum()))
+    whole[np.argsort(-(exact - whole), kind="stable")[:leftover]] += 1
+    return (quota + whole).astype(np.int64)
+
+
+def _sampling_weights(df: pd.DataFrame, weight_column: str) -> pd.Series:
+    """Validated numeric sampling weights."""
+    if weight_column not in df.columns:
+        raise ValueError(f"Weight column '{weight_column}' not found. Available: {list(df.columns)}")
+    weights = pd.to_numeric(df[weight_column], errors="coerce")
+    if weights.isna().any() or (weights < 0).any():
+        raise ValueError(f"Weight column '{weight_column}' must contain non-negative numbers")
+    return weights
+
+
+def _read_chunks(file_path: str, sampling_params: dict):
+    """Yield the file as DataFrames of at most chunkRows rows."""
+    chunk_rows = sampling_params.get("chunkRows") or STREAM_CHUNK_ROWS
+    ext = os.path.splitext(file_path)[1].lower()
+
+    if ext in [".xlsx", ".xls"]:
+        import openpyxl
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            sheet_name = sampling_params.get("sheetName")
+            ws = wb[sheet_name] if sheet_name else wb.worksheets[0]
+            rows = ws.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+            batch = []
+            for row in rows:
+                batch.append(row[:len(columns)])
+                if len(batch) == chunk_rows:
+                    yield pd.DataFrame(batch, columns=columns)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=columns)
+        finally:
+            wb.close()
+
+    elif ext in [".csv", ".tsv"]:
+        encoding = sampling_params.get("encoding")
+        if not encoding:
+            with open(file_path, 'rb') as f:
+                encoding = chardet.detect(f.read(10000))['encoding'] or 'utf-8'
+        delimiter = '\t' if ext == ".tsv" else ','
+        yield from pd.read_csv(file_path, encoding=encoding, sep=delimiter, chunksize=chunk_rows)
 
     else:
-        raise ValueError(f"Invalid sampling method: {method}. Must be one of: random, stratified, systematic, head, tail")
-
-    # Convert to list of dicts
-    sample_data = sampled_df.to_dict(orient="records")
-
-    return {
-        "sample": sample_data,
-        "indices": indices,
-        "sampleSize": len(sample_data),
-        "originalSize": original_size,
-        "method": method
-    }
+        raise ValueError(f"Cannot auto-detect format for extension: {ext}")
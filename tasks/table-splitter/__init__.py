@@ -2,7 +2,7 @@
 import typing
 class Inputs(typing.TypedDict):
     data: list[dict]
-    method: typing.Literal["ratio", "condition", "chunks", "stratified"]
+    method: typing.Literal["ratio", "condition", "chunks", "stratified", "hash"]
     params: dict | None
 class Outputs(typing.TypedDict):
     splits: typing.NotRequired[list[dict]]
@@ -12,6 +12,30 @@ class Outputs(typing.TypedDict):
 from oocana import Context
 import pandas as pd
 import numpy as np
+import hashlib
+import os
+import re
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+SplitParams = dict[str, typing.Any]
+
+
+OUTPUT_FORMATS = {"csv": ".csv", "parquet": ".parquet", "xlsx": ".xlsx"}
+EXCEL_MAX_ROWS = 1048575
+CONDITION_REFERENCE = re.compile(r"\{([^{}]+)\}")
+
+
+class SplitResult(typing.TypedDict):
+    name: str
+    data: typing.NotRequired[list[dict]]
+    path: typing.NotRequired[str]
+    size: int
+    percentage: float
 
 
 async def main(params: Inputs, context: Context) -> Outputs:
@@ -23,6 +47,10 @@ async def main(params: Inputs, context: Context) -> Outputs:
     - condition: Split based on conditions/expressions
     - chunks: Split into fixed-size chunks
     - stratified: Split while maintaining class distribution
+    - hash: Split by a stable hash of key columns, reproducible across runs and appended data
+
+    With params.outputFormat set to csv, parquet (needs pyarrow) or xlsx, each split is written
+    to its own file under the session directory as it is produced and only its path is returned.
     """
 
     # Extract parameters
@@ -35,21 +63,25 @@ async def main(params: Inputs, context: Context) -> Outputs:
 
     df = pd.DataFrame(data)
     original_size = len(df)
+    writer = SplitWriter(split_params, context.session_dir, original_size)
 
     splits: list[SplitResult] = []
 
     # Perform splitting based on method
     if method == "ratio":
-        splits = split_by_ratio(df, split_params, original_size)
+        splits = split_by_ratio(df, split_params, original_size, writer)
 
     elif method == "condition":
-        splits = split_by_condition(df, split_params, original_size)
+        splits = split_by_condition(df, split_params, original_size, writer)
 
     elif method == "chunks":
-        splits = split_by_chunks(df, split_params, original_size)
+        splits = split_by_chunks(df, split_params, original_size, writer)
 
     elif method == "stratified":
-        splits = split_stratified(df, split_params, original_size)
+        splits = split_stratified(df, split_params, original_size, writer)
+
+    elif method == "hash":
+        splits = split_by_hash(df, split_params, original_size, writer)
 
     else:
         raise ValueError(f"Invalid splitting method: {method}")
@@ -60,7 +92,73 @@ async def main(params: Inputs, context: Context) -> Outputs:
     }
 
 
-def split_by_ratio(df: pd.DataFrame, params: SplitParams, original_size: int) -> list[SplitResult]:
+class SplitWriter:
+    """Turns each split into an output entry, inline or as its own file in the session directory."""
+
+    def __init__(self, params: SplitParams, session_dir: str, original_size: int):
+        self.original_size = original_size
+        self.format = params.get("outputFormat") or "inline"
+        if self.format != "inline" and self.format not in OUTPUT_FORMATS:
+            raise ValueError(f"Invalid output format: {self.format}. Must be one of: inline, {', '.join(OUTPUT_FORMATS)}")
+        if self.format == "parquet" and pyarrow is None:
+            raise ValueError("Output format 'parquet' requires pyarrow, which is not installed. Use csv or xlsx instead")
+
+        self.directory = None
+        self.used_names: set[str] = set()
+        if self.format != "inline":
+            output_dir = params.get("outputDir") or "splits"
+            self.directory = output_dir if os.path.isabs(output_dir) else os.path.join(session_dir, output_dir)
+            os.makedirs(self.directory, exist_ok=True)
+
+    def add(self, name: str, split_df: pd.DataFrame) -> SplitResult:
+        """Emit one split; in file mode its rows are written straight from the frame."""
+        if self.format == "inline":
+            return {
+                "name": name,
+                "data": split_df.to_dict(orient="records"),
+                "size": len(split_df),
+                "percentage": (len(split_df) / self.original_size) * 100
+            }
+
+        path = os.path.join(self.directory, self._file_name(name))
+        if self.format == "csv":
+            split_df.to_csv(path, index=False)
+        elif self.format == "parquet":
+            split_df.to_parquet(path, index=False)
+        else:
+            if len(split_df) > EXCEL_MAX_ROWS:
+                raise ValueError(f"Split '{name}' has {len(split_df)} rows, more than an xlsx sheet can hold ({EXCEL_MAX_ROWS})")
+
+            import xlsxwriter
+
+            # constant_memory flushes every row to disk once written, so rows must go in order
+            workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+            worksheet = workbook.add_worksheet()
+            worksheet.write_row(0, 0, [str(col) for col in split_df.columns])
+            values = split_df.astype(object).where(split_df.notna(), None)
+            for row_idx, row_data in enumerate(values.itertuples(index=False, name=None), start=1):
+                worksheet.write_row(row_idx, 0, row_data)
+            workbook.close()
+
+        return {
+            "name": name,
+            "path": path,
+            "size": len(split_df),
+            "percentage": (len(split_df) / self.original_size) * 100
+        }
+
+    def _file_name(self, name: str) -> str:
+        """File-system safe, unique file name for a split."""
+        stem = re.sub(r"[^\w.-]+", "_", str(name)).strip("._") or "split"
+        candidate, counter = stem, 1
+        while candidate in self.used_names:
+            counter += 1
+            candidate = f"{stem}_{counter}"
+        self.used_names.add(candidate)
+        return candidate + OUTPUT_FORMATS[self.format]
+
+
+def split_by_ratio(df: pd.DataFrame, params: SplitParams, original_size: int, writer: SplitWriter) -> list[SplitResult]:
     """Split data by ratios."""
     ratios = params.get("ratios")
     names = params.get("names")
@@ -99,72 +197,87 @@ def split_by_ratio(df: pd.DataFrame, params: SplitParams, original_size: int) ->
         end_idx = start_idx + size
         split_df = df.iloc[start_idx:end_idx]
 
-        splits.append({
-            "name": name,
-            "data": split_df.to_dict(orient="records"),
-            "size": len(split_df),
-            "percentage": (len(split_df) / original_size) * 100
-        })
+        splits.append(writer.add(name, split_df))
 
         start_idx = end_idx
 
     return splits
 
 
-def split_by_condition(df: pd.DataFrame, params: SplitParams, original_size: int) -> list[SplitResult]:
+def split_by_condition(df: pd.DataFrame, params: SplitParams, original_size: int, writer: SplitWriter) -> list[SplitResult]:
     """Split data based on conditions."""
     conditions = params.get("conditions")
+    mode = params.get("conditionMode") or "multi"
 
     if not conditions:
         raise ValueError("Condition method requires 'conditions' parameter")
 
+    if mode not in ["multi", "firstMatch"]:
+        raise ValueError(f"Invalid condition mode: {mode}. Must be one of: multi, firstMatch")
+
+    # Compile every condition before any split is emitted
+    compiled = [compile_condition(condition, df) for condition in conditions]
+
     splits = []
-    remaining_df = df.copy()
+    unassigned = np.ones(original_size, dtype=bool)
 
-    for condition in conditions:
-        name = condition.get("name")
-        expression = condition.get("expression")
+    for name, expression, code, columns in compiled:
+        mask = _condition_mask(expression, code, columns, df)
 
-        if not name or not expression:
-            raise ValueError("Each condition must have 'name' and 'expression'")
+        # multi: a row joins every split it matches; firstMatch: only the first one
+        selected = mask & unassigned if mode == "firstMatch" else mask
+        unassigned &= ~mask
 
-        try:
-            # Evaluate condition - replace column references
-            # e.g., "{age} >= 18" becomes "df['age'] >= 18"
-            eval_expr = expression
-            for col in df.columns:
-                eval_expr = eval_expr.replace(f"{{{col}}}", f"df['{col}']")
+        splits.append(writer.add(name, df.iloc[np.flatnonzero(selected)]))
 
-            # Create mask
-            mask = eval(eval_expr, {"df": df})
-            split_df = df[mask]
+    # Add remaining rows as a final split
+    if unassigned.any():
+        splits.append(writer.add("remaining", df.iloc[np.flatnonzero(unassigned)]))
 
-            splits.append({
-                "name": name,
-                "data": split_df.to_dict(orient="records"),
-                "size": len(split_df),
-                "percentage": (len(split_df) / original_size) * 100
-            })
+    return splits
 
-            # Remove matched rows from remaining
-            remaining_df = remaining_df[~remaining_df.index.isin(split_df.index)]
 
-        except Exception as e:
-            raise ValueError(f"Error evaluating condition '{expression}': {str(e)}")
+def compile_condition(condition: dict, df: pd.DataFrame) -> tuple[str, str, typing.Any, list[pd.Series]]:
+    """Compile one condition, turning {column} references into bound Series lookups."""
+    name = condition.get("name")
+    expression = condition.get("expression")
 
-    # Add remaining rows as a final split
-    if len(remaining_df) > 0:
-        splits.append({
-            "name": "remaining",
-            "data": remaining_df.to_dict(orient="records"),
-            "size": len(remaining_df),
-            "percentage": (len(remaining_df) / original_size) * 100
-        })
+    if not name or not expression:
+        raise ValueError("Each condition must have 'name' and 'expression'")
 
-    return splits
+    # e.g. "{age} >= 18" becomes "__columns[0] >= 18"; braces naming no column are left as written
+    columns: list[pd.Series] = []
+    slots: dict[str, int] = {}
+
+    def bind(match: re.Match) -> str:
+        col = match.group(1)
+        if col not in df.columns:
+            return match.group(0)
+        if col not in slots:
+            slots[col] = len(columns)
+            columns.append(df[col])
+        return f"__columns[{slots[col]}]"
+
+    try:
+        code = compile(CONDITION_REFERENCE.sub(bind, expression), "<condition>", "eval")
+    except SyntaxError as e:
+        raise ValueError(f"Error evaluating condition '{expression}': {str(e)}")
+
+    return name, expression, code, columns
+
+
+def _condition_mask(expression: str, code: typing.Any, columns: list[pd.Series], df: pd.DataFrame) -> np.ndarray:
+    """Evaluate a compiled condition into a boolean array over all rows."""
+    try:
+        mask = eval(code, {"df": df, "__columns": columns})
+        if isinstance(mask, pd.Series):
+            return mask.fillna(False).to_numpy(dtype=bool)
+        return np.broadcast_to(np.asarray(mask, dtype=bool), len(df)).copy()
+    except Exception as e:
+        raise ValueError(f"Error evaluating condition '{expression}': {str(e)}")
 
 
-def split_by_chunks(df: pd.DataFrame, params: SplitParams, original_size: int) -> list[SplitResult]:
+def split_by_chunks(df: pd.DataFrame, params: SplitParams, original_size: int, writer: SplitWriter) -> list[SplitResult]:
     """Split data into fixed-size chunks."""
     chunk_size = params.get("chunkSize")
 
@@ -182,17 +295,12 @@ def split_by_chunks(df: pd.DataFrame, params: SplitParams, original_size: int) -
         end_idx = min((i + 1) * chunk_size, original_size)
         chunk_df = df.iloc[start_idx:end_idx]
 
-        splits.append({
-            "name": f"chunk_{i+1}",
-            "data": chunk_df.to_dict(orient="records"),
-            "size": len(chunk_df),
-            "percentage": (len(chunk_df) / original_size) * 100
-        })
+        splits.append(writer.add(f"chunk_{i+1}", chunk_df))
 
     return splits
 
 
-def split_stratified(df: pd.DataFrame, params: SplitParams, original_size: int) -> list[SplitResult]:
+def split_stratified(df: pd.DataFrame, params: SplitParams, original_size: int, writer: SplitWriter) -> list[SplitResult]:
     """Split data while maintaining class distribution."""
     stratify_column = params.get("stratifyColumn")
     ratios = params.get("ratios")
@@ -219,38 +327,101 @@ def split_stratified(df: pd.DataFrame, params: SplitParams, original_size: int)
     elif len(names) != len(ratios):
         raise ValueError(f"Number of names must match number of ratios")
 
-    # Initialize splits
-    split_dfs = [pd.DataFrame() for _ in range(len(ratios))]
+    # One factorization: codes follow first appearance, missing values form their own stratum
+    codes, _ = pd.factorize(df[stratify_column], use_na_sentinel=False)
+    counts = np.bincount(codes)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
 
-    # Split each stratum according to ratios
-    for stratum_value in df[stratify_column].unique():
-        stratum_df = df[df[stratify_column] == stratum_value]
+    # Rows grouped by stratum, keeping their original order inside each stratum
+    order = np.argsort(codes, kind="stable")
 
-        # Shuffle within stratum
-        if seed is not None:
-            stratum_df = stratum_df.sample(frac=1, random_state=seed).reset_index(drop=True)
+    # Shuffle within stratum
+    if seed is not None:
+        for start, count in zip(starts, counts):
+            order[start:start + count] = order[start:start + count][np.random.RandomState(seed).permutation(count)]
 
-        stratum_size = len(stratum_df)
-        start_idx = 0
+    # Position of every row inside its stratum, and the split boundaries of every stratum
+    strata = np.repeat(np.arange(len(counts)), counts)
+    ranks = np.arange(len(order)) - starts[strata]
+    boundaries = np.cumsum(np.floor(np.outer(counts, ratios[:-1])).astype(np.int64), axis=1)
 
-        for i, ratio in enumerate(ratios):
-            if i == len(ratios) - 1:
-                # Last split gets remaining rows
-                end_idx = stratum_size
-            else:
-                end_idx = start_idx + int(stratum_size * ratio)
+    # A row's split is the number of its stratum's boundaries it has passed
+    labels = np.zeros(len(order), dtype=np.int64)
+    for i in range(len(ratios) - 1):
+        labels += ranks >= boundaries[strata, i]
 
-            split_dfs[i] = pd.concat([split_dfs[i], stratum_df.iloc[start_idx:end_idx]])
-            start_idx = end_idx
+    split_dfs = [df.iloc[order[labels == i]] for i in range(len(ratios))]
 
     # Convert to output format
     splits = []
     for name, split_df in zip(names, split_dfs):
-        splits.append({
-            "name": name,
-            "data": split_df.to_dict(orient="records"),
-            "size": len(split_df),
-            "percentage": (len(split_df) / original_size) * 100
-        })
+        splits.append(writer.add(name, split_df))
+
+    return splits
+
+
+def split_by_hash(df: pd.DataFrame, params: SplitParams, original_size: int, writer: SplitWriter) -> list[SplitResult]:
+    """Split data by a salted hash of key columns, so a row's split depends only on its keys."""
+    key_columns = params.get("keyColumns")
+    ratios = params.get("ratios")
+    names = params.get("names")
+    salt = params.get("salt") or ""
+
+    if not key_columns:
+        raise ValueError("Hash method requires 'keyColumns' parameter")
+
+    if not ratios:
+        raise ValueError("Hash method requires 'ratios' parameter")
+
+    missing = [col for col in key_columns if col not in df.columns]
+    if missing:
+        raise ValueError(f"Key columns {missing} not found. Available: {list(df.columns)}")
+
+    # Validate ratios
+    total_ratio = sum(ratios)
+    if not (0.99 <= total_ratio <= 1.01):
+        raise ValueError(f"Ratios must sum to 1.0, got {total_ratio}")
+
+    # Generate default names
+    if not names:
+        names = [f"split_{i+1}" for i in range(len(ratios))]
+    elif len(names) != len(ratios):
+        raise ValueError(f"Number of names ({len(names)}) must match number of ratios ({len(ratios)})")
+
+    # Map every row's hash to [0, 1) and bucket it by the cumulative ratios
+    buckets = hash_buckets(df, key_columns, salt)
+    boundaries = np.cumsum(ratios[:-1]) / total_ratio
+    labels = np.searchsorted(boundaries, buckets, side="right")
+
+    splits = []
+    for i, name in enumerate(names):
+        split_df = df.iloc[np.flatnonzero(labels == i)]
+        splits.append(writer.add(name, split_df))
 
     return splits
+
+
+def hash_buckets(df: pd.DataFrame, key_columns: list[str], salt: str) -> np.ndarray:
+    """Salted SipHash of the canonical key text of every row, scaled to [0, 1)."""
+    keys = _key_text(df[key_columns[0]])
+    for col in key_columns[1:]:
+        keys = keys + "\x1f" + _key_text(df[col])
+
+    # SipHash takes a 16-character key; derive it from the salt so every salt gives an independent split
+    hash_key = hashlib.md5(salt.encode("utf-8")).hexdigest()[:16]
+    hashes = pd.util.hash_array(keys.to_numpy(dtype=object), hash_key=hash_key)
+    return (hashes >> np.uint64(11)) / float(1 << 53)
+
+
+def _key_text(values: pd.Series) -> pd.Series:
+    """Canonical text of key values, so 3, 3.0 and "3" read from different sources hash alike."""
+    if pd.api.types.is_integer_dtype(values):
+        # Stringify integers directly; a float round trip merges distinct ids above 2**53
+        text = values.astype(str)
+    elif pd.api.types.is_float_dtype(values):
+        text = values.astype(str)
+        integral = values.notna() & (values == np.floor(values)) & (values.abs() < 2 ** 53)
+        text[integral] = values[integral].astype(np.int64).astype(str)
+    else:
+        text = values.astype(str)
+    return text.where(values.notna(), "")